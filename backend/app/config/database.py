@@ -1,9 +1,51 @@
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+_client = None
+
+def get_client() -> AsyncIOMotorClient:
+    # One pooled client per process; motor hands out connections from the pool.
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            os.getenv("MONGO_URI"),
+            maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", 100)),
+            minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", 0)),
+            serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000)),
+        )
+    return _client
+
 def get_database():
-    client = MongoClient(os.getenv("MONGO_URI"))
-    return client["chat_app"]
\ No newline at end of file
+    return get_client()["chat_app"]
+
+def close_database():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+async def ensure_indexes(db):
+    # Backs keyset pagination on (reminder_time, _id) and the list filters.
+    # reminder_time is a BSON date, so range filters use these directly.
+    await db.reminders.create_index([("reminder_time", 1), ("_id", 1)])
+    await db.reminders.create_index([("completed", 1), ("reminder_time", 1), ("_id", 1)])
+    await db.reminders.create_index([("priority", 1), ("reminder_time", 1), ("_id", 1)])
+    await db.reminders.create_index([("category", 1), ("reminder_time", 1), ("_id", 1)])
+    # "Due soon and not completed", as read by the scheduler at startup
+    await db.reminders.create_index([("completed", 1), ("fired", 1), ("reminder_time", 1)])
+    # Delta sync: changes and tombstones after a given version
+    await db.reminders.create_index("version")
+    await db.reminder_tombstones.create_index("version")
+    await db.reminder_tombstones.create_index(
+        "deleted_at", expireAfterSeconds=int(os.getenv("REMINDER_TOMBSTONE_TTL_SECONDS", 7 * 24 * 3600))
+    )
+    # Persistent extraction cache entries expire on their own
+    await db.extraction_cache.create_index("expires_at", expireAfterSeconds=0)
+    # Replay range reads per client; undelivered entries expire after a while
+    await db.deliveries.create_index([("client_id", 1), ("seq", 1)], unique=True)
+    await db.deliveries.create_index(
+        "created_at", expireAfterSeconds=int(os.getenv("DELIVERY_LOG_TTL_SECONDS", 2 * 24 * 3600))
+    )
@@ -0,0 +1,34 @@
+from logging.handlers import QueueHandler, QueueListener
+import logging
+import os
+import queue
+
+_listener = None
+
+def setup_logging():
+    """Route the `app` loggers through a queue drained by a background thread.
+
+    QueueHandler.prepare() still renders the message (and any traceback) on
+    the calling thread, before the record is enqueued. Only the formatter
+    and the write to stderr run on the listener thread, so a slow or
+    blocked stderr never holds up the event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    records = queue.SimpleQueue()
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+
+    logger = logging.getLogger("app")
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logger.addHandler(QueueHandler(records))
+    logger.propagate = False
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
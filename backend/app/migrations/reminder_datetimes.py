@@ -0,0 +1,87 @@
+"""Convert stored reminders to the canonical schema.
+
+Rewrites string `reminder_time` values as native UTC datetimes and fills in
+`priority` and `category` where they are missing. Work is done in `_id`
+order in batches of bulk writes. The last processed `_id` is checkpointed in
+the `migrations` collection, so an interrupted run resumes where it stopped.
+
+    cd backend && python -m app.migrations.reminder_datetimes [--batch-size N] [--restart]
+"""
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+import argparse
+import asyncio
+from app.config.database import close_database, get_database
+from app.models.reminder import DEFAULT_CATEGORY, DEFAULT_PRIORITY
+
+MIGRATION_ID = "reminder_datetimes"
+
+def parse_reminder_time(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+async def migrate(db, batch_size: int = 1000, restart: bool = False) -> dict:
+    if restart:
+        await db.migrations.delete_one({"_id": MIGRATION_ID})
+    checkpoint = await db.migrations.find_one({"_id": MIGRATION_ID}) or {}
+    last_id = checkpoint.get("last_id")
+    totals = {"converted": checkpoint.get("converted", 0), "skipped": checkpoint.get("skipped", 0)}
+
+    needs_migration = {"$or": [
+        {"reminder_time": {"$type": "string"}},
+        {"priority": {"$exists": False}},
+        {"category": {"$exists": False}},
+    ]}
+    while True:
+        query = needs_migration if last_id is None else {"$and": [{"_id": {"$gt": last_id}}, needs_migration]}
+        batch = await db.reminders.find(
+            query, {"reminder_time": 1, "priority": 1, "category": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        operations = []
+        for doc in batch:
+            update = {}
+            if isinstance(doc.get("reminder_time"), str):
+                try:
+                    update["reminder_time"] = parse_reminder_time(doc["reminder_time"])
+                except ValueError:
+                    totals["skipped"] += 1
+                    print(f"[Migration] Unparseable reminder_time on {doc['_id']}: {doc['reminder_time']!r}")
+            if "priority" not in doc:
+                update["priority"] = DEFAULT_PRIORITY
+            if "category" not in doc:
+                update["category"] = DEFAULT_CATEGORY
+            if update:
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+        if operations:
+            await db.reminders.bulk_write(operations, ordered=False)
+        totals["converted"] += len(operations)
+
+        last_id = batch[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": MIGRATION_ID}, {"$set": {"last_id": last_id, **totals}}, upsert=True
+        )
+        print(f"[Migration] {totals['converted']} converted, {totals['skipped']} skipped (last _id {last_id})")
+
+    await db.migrations.update_one(
+        {"_id": MIGRATION_ID}, {"$set": {"finished_at": datetime.now(timezone.utc), **totals}}, upsert=True
+    )
+    return totals
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    args = parser.parse_args()
+    try:
+        totals = await migrate(get_database(), args.batch_size, args.restart)
+        print(f"[Migration] Done: {totals}")
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,20 +0,0 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional 
-class Reminder(BaseModel):
-    _id: Optional[str] = None
-    task: str
-    reminder_time: datetime
-    completed: bool = False
-
-    class Config:
-        arbitrary_types_allowed = True
-        json_encoders = {datetime: lambda v: v.isoformat()}  # ISO 8601 format
-        
-class ReminderResponse(BaseModel):
-    reminders: list[Reminder]
-
-    class Config:
-        arbitrary_types_allowed = True
-        json_encoders = {datetime: lambda v: v.isoformat()}  # ISO 8601 format
-
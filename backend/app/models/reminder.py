@@ -1,13 +1,78 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, Field
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
+
+# Canonical `reminders` document:
+#   task: str, reminder_time: UTC datetime (BSON date), completed: bool,
+#   priority: "high" | "medium" | "low", category: str,
+#   client_id: str | None, version: int, fired: bool,
+#   recurrence (repeating orders only): {rule: RRULE str, start: UTC datetime, until: UTC datetime}
+DEFAULT_PRIORITY = "medium"
+DEFAULT_CATEGORY = "general"
+PRIORITIES = ("high", "medium", "low")
+
+# Internal bookkeeping that is never sent to clients
+PRIVATE_FIELDS = ("fired_by",)
+
+def format_datetime(value: datetime) -> str:
+    # Same ISO layout ("...Z") the API has always returned
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+def reminder_to_json(doc: dict) -> dict:
+    """Serialize a reminders document straight to JSON-ready types.
+
+    List and export responses use this instead of building a model per row.
+    """
+    row = {key: value for key, value in doc.items() if key not in PRIVATE_FIELDS}
+    row["_id"] = str(doc["_id"])
+    for key, value in row.items():
+        if isinstance(value, datetime):
+            row[key] = format_datetime(value)
+        elif isinstance(value, dict):
+            row[key] = {k: format_datetime(v) if isinstance(v, datetime) else v for k, v in value.items()}
+    return row
+
+
+class Recurrence(BaseModel):
+    rule: str
+    start: datetime
+    until: datetime
+
+    class Config:
+        json_encoders = {datetime: format_datetime}
+
 
 class Reminder(BaseModel):
-    _id: Optional[str] = None
+    # Schema of one reminder as returned by the API
+    id: Optional[str] = Field(None, alias="_id")
     task: str
     reminder_time: datetime
     completed: bool = False
+    priority: str = DEFAULT_PRIORITY
+    category: str = DEFAULT_CATEGORY
+    version: Optional[int] = None
+    recurrence: Optional[Recurrence] = None
+    # Next occurrences of a recurring reminder, computed from the rule
+    upcoming: Optional[List[datetime]] = None
 
     class Config:
         arbitrary_types_allowed = True
-        json_encoders = {datetime: lambda v: v.isoformat()}
\ No newline at end of file
+        populate_by_name = True
+        json_encoders = {datetime: format_datetime}
+
+
+class ReminderFilter(BaseModel):
+    completed: Optional[bool] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    priority: Optional[str] = None
+    category: Optional[str] = None
+
+
+class BulkReminderRequest(BaseModel):
+    # Target either an explicit id list or everything matching `filter`
+    action: Literal["complete", "uncomplete", "delete"]
+    ids: Optional[List[str]] = None
+    filter: Optional[ReminderFilter] = None
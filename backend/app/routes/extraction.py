@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from app.services import rule_extractor
+from app.services.extraction_cache import extraction_cache
+from app.services.reminder_service import BATCH_ENABLED, batcher
+
+router = APIRouter()
+
+@router.get("/extraction/stats")
+async def get_extraction_stats():
+    # Hit/miss counters of the extraction cache in front of the LLM, and how
+    # often the rule-based fast path answered or agreed with the LLM
+    return {
+        "cache": extraction_cache.stats(),
+        "batching": {"enabled": BATCH_ENABLED, **batcher.stats()},
+        "rules": {
+            "mode": rule_extractor.MODE,
+            **rule_extractor.stats,
+            "shadow_agreement_rate": rule_extractor.shadow_agreement_rate(),
+        },
+    }
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.services import rule_extractor
+from app.services.extraction_cache import extraction_cache
+from app.services.metrics import metrics
+from app.services.notifier import registry
+from app.services.profiler import profiler
+from app.services.scheduler import scheduler
+
+router = APIRouter()
+
+# State that already lives elsewhere is read when /metrics is scraped
+metrics.gauge("ws_active_connections", "Open WebSocket connections on this worker", lambda: len(registry))
+metrics.gauge("ws_send_queue_frames", "Frames waiting in per-connection send queues", registry.queued)
+metrics.gauge("scheduler_pending_reminders", "Reminders waiting in the scheduler heap", lambda: scheduler.stats()["pending"])
+metrics.gauge("scheduler_next_due_seconds", "Seconds until the next reminder is due", lambda: scheduler.stats()["next_due_in"])
+metrics.gauge("scheduler_last_lag_seconds", "Firing lag of the most recent reminder", lambda: scheduler.last_lag)
+metrics.gauge("scheduler_max_lag_seconds", "Largest firing lag seen since startup", lambda: scheduler.max_lag)
+metrics.gauge("extraction_cache_entries", "Entries held in the in-memory extraction cache", lambda: extraction_cache.stats()["entries"])
+metrics.gauge("rule_extractor_shadow_agreement", "Share of confident rule answers that matched the LLM", rule_extractor.shadow_agreement_rate)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/metrics/profile", response_class=PlainTextResponse)
+async def get_profile(limit: int = 200):
+    # Collapsed stacks from the sampling profiler (PROFILE_INTERVAL_MS)
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler is disabled; set PROFILE_INTERVAL_MS")
+    return PlainTextResponse(profiler.collapsed(limit))
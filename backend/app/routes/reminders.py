@@ -1,28 +1,221 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from pymongo.database import Database
-from app.models.reminder import Reminder
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from bson.errors import InvalidId
+from app.models.reminder import BulkReminderRequest, Reminder, format_datetime, reminder_to_json
+from app.services.recurrence import upcoming
+from app.services.reminder_changes import changes_since, committed_version, publish_changes, record_deletions, reserve_versions
+from app.services.scheduler import scheduler, to_epoch
+from pymongo import ReturnDocument
+from datetime import datetime, timezone
+from typing import List, Optional
+import base64
+import hashlib
+import json
 
 router = APIRouter()
 
-def get_db(request: Request):
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def get_db(request: Request) -> AsyncIOMotorDatabase:
     return request.app.db
 
+def to_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def encode_cursor(doc: dict) -> str:
+    # Documents not yet migrated still hold a string reminder_time
+    reminder_time = doc["reminder_time"]
+    is_date = isinstance(reminder_time, datetime)
+    value = to_utc(reminder_time).isoformat() if is_date else str(reminder_time)
+    raw = json.dumps([value, str(doc["_id"]), is_date])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        reminder_time, raw_id, is_date = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if is_date:
+            reminder_time = datetime.fromisoformat(reminder_time)
+        return reminder_time, ObjectId(raw_id)
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def build_filter(
+    completed: Optional[bool] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    priority: Optional[str] = None,
+    category: Optional[str] = None,
+) -> dict:
+    query = {}
+    if completed is not None:
+        query["completed"] = completed
+    if start is not None or end is not None:
+        query["reminder_time"] = {}
+        if start is not None:
+            query["reminder_time"]["$gte"] = to_utc(start)
+        if end is not None:
+            query["reminder_time"]["$lt"] = to_utc(end)
+        if start is not None:
+            # A recurring reminder's reminder_time is only its next occurrence;
+            # it is in the window if any later occurrence can fall inside it.
+            series = {"recurrence.until": {"$gte": to_utc(start)}}
+            if end is not None:
+                series["reminder_time"] = {"$lt": to_utc(end)}
+            query["$or"] = [{"reminder_time": query.pop("reminder_time")}, series]
+    if priority is not None:
+        query["priority"] = priority
+    if category is not None:
+        query["category"] = category
+    return query
+
+def after_cursor(query: dict, cursor: Optional[str]) -> dict:
+    if not cursor:
+        return query
+    reminder_time, last_id = decode_cursor(cursor)
+    keyset = {"$or": [
+        {"reminder_time": {"$gt": reminder_time}},
+        {"reminder_time": reminder_time, "_id": {"$gt": last_id}},
+    ]}
+    if not isinstance(reminder_time, datetime):
+        # Strings sort before dates and $gt does not cross types
+        keyset["$or"].append({"reminder_time": {"$type": "date"}})
+    return {"$and": [query, keyset]} if query else keyset
+
+def with_upcoming(doc: dict, start: Optional[datetime] = None, end: Optional[datetime] = None) -> dict:
+    # Occurrences of a recurring reminder are expanded here, per row, rather
+    # than stored
+    row = reminder_to_json(doc)
+    if doc.get("recurrence") and not doc.get("completed"):
+        first = max(to_utc(doc["reminder_time"]), to_utc(start)) if start else doc["reminder_time"]
+        row["upcoming"] = [format_datetime(t) for t in upcoming(doc["recurrence"], first, to_utc(end) if end else None)]
+    return row
+
+def make_etag(version: int, request: Request) -> str:
+    # Any change bumps the global version; the query string keeps pages and
+    # filters apart.
+    query = hashlib.md5(request.url.query.encode()).hexdigest()[:12]
+    return f'W/"{version}-{query}"'
+
 @router.get("/reminders", response_model=List[Reminder])
-async def get_reminders(db: Database = Depends(get_db)):
-    reminders = db.reminders.find()
-    return [Reminder(**r) for r in reminders]
+async def get_reminders(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[int] = Query(None, ge=0),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    filters: dict = Depends(build_filter),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+):
+    # Read before the data, so the version never claims a write not yet visible
+    version = await committed_version(db)
+    etag = make_etag(version, request)
+    headers = {"ETag": etag, "X-Version": str(version), "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    # Delta mode: only what was created, toggled or deleted after `since`
+    if since is not None:
+        return JSONResponse(await changes_since(db, since), headers=headers)
+
+    # Keyset pagination ordered by (reminder_time, _id); the cursor for the
+    # next page is returned in the X-Next-Cursor header.
+    query = after_cursor(filters, cursor)
+    docs = await db.reminders.find(query).sort([("reminder_time", 1), ("_id", 1)]).to_list(length=limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(docs[-1])
+    return JSONResponse([with_upcoming(doc, start, end) for doc in docs], headers=headers)
+
+@router.get("/reminders/export")
+async def export_reminders(
+    filters: dict = Depends(build_filter),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+):
+    # Streams one JSON document per line without holding the result set in memory.
+    async def stream():
+        async for doc in db.reminders.find(filters).sort([("reminder_time", 1), ("_id", 1)]):
+            yield json.dumps(with_upcoming(doc)) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def parse_id(id: str):
+    # Reminders inserted by the service have ObjectIds; anything else is
+    # looked up as a plain string id.
+    try:
+        return ObjectId(id)
+    except (InvalidId, TypeError):
+        return id
+
+def reschedule_reopened(docs: list):
+    # A reminder that was completed at startup, or whose due time passed
+    # while it was completed, is not in the scheduler; reopening queues it
+    # again unless it already fired.
+    for doc in docs:
+        if doc.get("completed") or doc.get("fired"):
+            continue
+        try:
+            due = datetime.fromtimestamp(to_epoch(doc["reminder_time"]), timezone.utc)
+        except (KeyError, TypeError, ValueError):
+            continue
+        scheduler.schedule(doc["_id"], doc.get("task", "untitled task"), due, doc.get("client_id"))
+
+@router.post("/reminders/bulk")
+async def bulk_update_reminders(request: BulkReminderRequest, db: AsyncIOMotorDatabase = Depends(get_db)):
+    # One update_many/delete_many for the whole set; `results` maps each
+    # targeted id to what happened to it.
+    if request.ids is None and request.filter is None:
+        raise HTTPException(status_code=400, detail="Provide ids or filter")
+    if request.ids is not None:
+        query = {"_id": {"$in": [parse_id(id) for id in request.ids]}}
+    else:
+        query = build_filter(**request.filter.model_dump())
+
+    matched = [doc["_id"] async for doc in db.reminders.find(query, {"_id": 1})]
+    results = {str(id): "not_found" for id in request.ids or []}
+
+    if request.action == "delete":
+        if matched:
+            await db.reminders.delete_many({"_id": {"$in": matched}})
+            version = await record_deletions(db, matched)
+            for reminder_id in matched:
+                scheduler.cancel(reminder_id)
+            await publish_changes(version, deleted=matched)
+        results.update({str(id): "deleted" for id in matched})
+        return {"action": request.action, "matched": len(matched), "modified": len(matched), "results": results}
+
+    completed = request.action == "complete"
+    updated = []
+    if matched:
+        async with reserve_versions(db) as version:
+            await db.reminders.update_many(
+                {"_id": {"$in": matched}, "completed": {"$ne": completed}},
+                {"$set": {"completed": completed, "version": version}},
+            )
+        updated = await db.reminders.find({"_id": {"$in": matched}, "version": version}).to_list(length=None)
+        if updated:
+            reschedule_reopened(updated)
+            await publish_changes(version, upserted=updated)
+    results.update({str(id): "unchanged" for id in matched})
+    results.update({str(doc["_id"]): "updated" for doc in updated})
+    return {"action": request.action, "matched": len(matched), "modified": len(updated), "results": results}
 
 @router.patch("/reminders/{id}", response_model=Reminder)
-async def update_reminder(id: str, db: Database = Depends(get_db)):
-    reminder = db.reminders.find_one({"_id": id})
-    if not reminder:
+async def update_reminder(id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
+    # Toggle the completed field atomically and get the new document back
+    async with reserve_versions(db) as version:
+        updated_reminder = await db.reminders.find_one_and_update(
+            {"_id": parse_id(id)},
+            [{"$set": {"completed": {"$not": [{"$ifNull": ["$completed", False]}]}, "version": version}}],
+            return_document=ReturnDocument.AFTER,
+        )
+    if not updated_reminder:
         raise HTTPException(status_code=404, detail="Reminder not found")
-    
-    # Toggle the completed field
-    new_completed = not reminder.get("completed", False)
-    db.reminders.update_one({"_id": id}, {"$set": {"completed": new_completed}})
-    
-    # Fetch updated reminder
-    updated_reminder = db.reminders.find_one({"_id": id})
-    return Reminder(**updated_reminder)
+    reschedule_reopened([updated_reminder])
+    await publish_changes(version, upserted=[updated_reminder])
+    return reminder_to_json(updated_reminder)
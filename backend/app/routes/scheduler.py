@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from app.services.scheduler import scheduler
+
+router = APIRouter()
+
+@router.get("/scheduler/stats")
+async def get_scheduler_stats():
+    # Queue depth and firing lag of the in-process reminder scheduler
+    return scheduler.stats()
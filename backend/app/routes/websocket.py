@@ -1,35 +1,140 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from app.services.reminder_service import process_message_for_reminder
+from app.services.delivery_log import delivery_log
+from app.services.metrics import metrics
+from app.services.notifier import notification_message, notifier, registry, send_json
+from app.services.reminder_service import extract_reminders, process_message_for_reminder
+from typing import Optional
+import asyncio
 import json
+import logging
+import os
+import uuid
 
 router = APIRouter()
 
-# Store active WebSocket connections
-active_connections = set()
+# Messages a single connection may have in flight before reads are paused
+MAX_PIPELINED_MESSAGES = int(os.getenv("WS_MAX_PIPELINED_MESSAGES", 4))
+
+logger = logging.getLogger(__name__)
+messages_received = metrics.counter("ws_messages_received_total", "Chat messages received over WebSockets")
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, client_id: Optional[str] = None, cursor: Optional[int] = None):
+    # Clients pass a stable user/session id so notifications reach them on
+    # any worker and on every socket they reconnect with.
+    websocket.state.client_id = client_id or uuid.uuid4().hex
     await websocket.accept()
-    active_connections.add(websocket)
+    registry.add(websocket.state.client_id, websocket)
+    if client_id and cursor is not None:
+        await replay_missed(websocket, client_id, cursor)
+    # Messages are extracted concurrently as they arrive but answered in
+    # arrival order. Each one takes a slot before its extraction starts and
+    # gives it back once answered; with no free slot the receive loop stops
+    # reading, which pushes back on the client.
+    slots = asyncio.Semaphore(MAX_PIPELINED_MESSAGES)
+    pending = asyncio.Queue()
+    replies = asyncio.create_task(reply_in_order(websocket, pending, slots))
     try:
         while True:
             data = await websocket.receive_text()
-            # Process message for reminder
-            response = await process_message_for_reminder(data, websocket)
-            # Echo user message back
-            user_message = {
-                "type": "message",
-                "text": data,
-                "isBot": False
-            }
-            await websocket.send_json(user_message)
-            # Send bot response if any
-            if response:
-                bot_message = {
-                    "type": "message",
-                    "text": response,
-                    "isBot": True
-                }
-                await websocket.send_json(bot_message)
+            replay_from = replay_request(data)
+            if replay_from is not None:
+                await replay_missed(websocket, websocket.state.client_id, replay_from)
+                continue
+            messages_received.inc()
+            if not await wait_for_slot(slots, replies):
+                break
+            pending.put_nowait((data, asyncio.create_task(extract_reminders(data))))
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
\ No newline at end of file
+        pass
+    finally:
+        registry.remove(websocket.state.client_id, websocket)
+        replies.cancel()
+        while not pending.empty():
+            _, extraction = pending.get_nowait()
+            extraction.cancel()
+
+async def wait_for_slot(slots: asyncio.Semaphore, replies: asyncio.Task) -> bool:
+    # False when the reply task has stopped, so no slot will ever come free
+    acquire = asyncio.ensure_future(slots.acquire())
+    await asyncio.wait({acquire, replies}, return_when=asyncio.FIRST_COMPLETED)
+    if acquire.done():
+        return True
+    acquire.cancel()
+    return False
+
+def replay_request(data: str) -> Optional[int]:
+    # {"type": "replay", "cursor": N} from a client that saw a gap in its
+    # sequences asks for everything logged after N; any other text is chat
+    if not data.startswith("{"):
+        return None
+    try:
+        frame = json.loads(data)
+    except ValueError:
+        return None
+    if isinstance(frame, dict) and frame.get("type") == "replay" and isinstance(frame.get("cursor"), int):
+        return frame["cursor"]
+    return None
+
+async def replay_missed(websocket: WebSocket, client_id: str, cursor: int):
+    # Everything logged after the client's last-seen sequence, in one frame,
+    # sent even when empty so the client knows the replay is complete. A
+    # message published while this runs may arrive both live and here;
+    # clients drop sequences they have already handled.
+    try:
+        messages = await delivery_log.missed(client_id, cursor)
+        last = messages[-1]["seq"] if messages else cursor
+        await send_json(websocket, {"type": "replay", "messages": messages, "cursor": last})
+        await delivery_log.compact(client_id, cursor)
+    except Exception as e:
+        logger.warning("[WebSocket Error] Replay failed for %s: %s", client_id, e)
+
+async def reply_in_order(websocket: WebSocket, pending: asyncio.Queue, slots: asyncio.Semaphore):
+    # A message that fails is reported to the client and the next one is
+    # answered. If the socket can no longer be written to, it is closed so
+    # the receive loop ends too.
+    try:
+        while True:
+            data, extraction = await pending.get()
+            try:
+                await reply(websocket, data, extraction)
+            except Exception as e:
+                logger.warning("[WebSocket Error] Failed to process message: %s", e)
+                await send_json(websocket, {"type": "error", "message": f"Failed to process message: {str(e)}"})
+            finally:
+                slots.release()
+    except Exception as e:
+        logger.warning("[WebSocket Error] Closing %s: %s", websocket.state.client_id, e)
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+
+async def reply(websocket: WebSocket, data: str, extraction: asyncio.Task):
+    # Process message for reminder
+    response = await process_message_for_reminder(data, websocket, extraction)
+    # Echo user message back
+    user_message = {
+        "type": "message",
+        "text": data,
+        "isBot": False
+    }
+    await send_json(websocket, user_message)
+    # Send bot response if any
+    if response:
+        bot_message = {
+            "type": "message",
+            "text": response,
+            "isBot": True
+        }
+        await send_json(websocket, bot_message)
+
+async def send_notification(tasks: list, client_id=None):
+    # Published through the notifier so whichever worker holds the client's
+    # sockets delivers it. Tasks due together arrive as one digest.
+    message = notification_message(tasks)
+    try:
+        [message] = await delivery_log.record(client_id, [message])
+    except Exception as e:
+        logger.warning("[Delivery Log] Failed to record notification: %s", e)
+    await notifier.notify(client_id, message)
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import logging
+from app.services.llm_client import complete_json
+from app.services.metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionBatcher:
+    """Coalesces extraction requests from all connections into batched LLM calls.
+
+    Messages submitted within `window_seconds` of the first one (or until
+    `max_size` are waiting) go out as one prompt that asks for one result
+    array per message. If the batched reply cannot be split back into one
+    array per message, each message is retried with its own call.
+    """
+
+    def __init__(self, build_prompt, build_batch_prompt, system: str, window_seconds: float, max_size: int):
+        self.build_prompt = build_prompt
+        self.build_batch_prompt = build_batch_prompt
+        self.system = system
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self._pending = []
+        self._timer = None
+        self._flushes = set()
+        self.batches = 0
+        self.batched_messages = 0
+        self.fallbacks = 0
+
+    async def extract(self, message: str, base_time):
+        """Return the parsed LLM reply for `message` once its batch completes."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((message, base_time, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window_seconds, self._flush)
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "batched_messages": self.batched_messages,
+            "fallbacks": self.fallbacks,
+            "waiting": len(self._pending),
+        }
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        batch = [entry for entry in batch if not entry[2].done()]
+        if not batch:
+            return
+        flush = asyncio.create_task(self._run(batch))
+        self._flushes.add(flush)
+        flush.add_done_callback(self._flushes.discard)
+
+    async def _run(self, batch):
+        if len(batch) == 1:
+            await self._run_single(*batch[0])
+            return
+
+        results = None
+        try:
+            # The batch shares the first message's clock; the window is milliseconds
+            prompt = self.build_batch_prompt([message for message, _, _ in batch], batch[0][1])
+            content = await complete_json(prompt, self.system)
+            with span("json_parse"):
+                results = self._split(json.loads(content), len(batch))
+        except Exception as e:
+            logger.warning("[Batcher] Batched extraction failed: %r", e)
+        if results is None:
+            self.fallbacks += 1
+            await asyncio.gather(*(self._run_single(*entry) for entry in batch))
+            return
+
+        self.batches += 1
+        self.batched_messages += len(batch)
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run_single(self, message, base_time, future):
+        try:
+            content = await complete_json(self.build_prompt(message, base_time), self.system)
+            with span("json_parse"):
+                result = json.loads(content)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def _split(reply, size: int):
+        results = reply.get("results") if isinstance(reply, dict) else reply
+        if not isinstance(results, list) or len(results) != size:
+            return None
+        if not all(isinstance(result, list) for result in results):
+            return None
+        return results
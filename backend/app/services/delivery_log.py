@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+import os
+from app.config.database import get_database
+
+# Entries expire after DELIVERY_LOG_TTL_SECONDS (TTL index, see ensure_indexes)
+REPLAY_LIMIT = int(os.getenv("DELIVERY_LOG_REPLAY_LIMIT", 500))
+
+
+class DeliveryLog:
+    """Per-client log of notifications and confirmations.
+
+    Each entry gets the next sequence number for its client. A reconnecting
+    client sends the last sequence it saw and gets everything after it from
+    one indexed range read. Entries up to that cursor are then deleted, and
+    a TTL index expires the rest.
+    """
+
+    async def record(self, client_id: str, messages: list) -> list:
+        """Append `messages` for `client_id`; returns them with "seq" set."""
+        if not client_id or not messages:
+            return messages
+        db = get_database()
+        counter = await db.delivery_counters.find_one_and_update(
+            {"_id": client_id},
+            {"$inc": {"seq": len(messages)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        first = counter["seq"] - len(messages) + 1
+        now = datetime.now(timezone.utc)
+        stamped = [{**message, "seq": first + i} for i, message in enumerate(messages)]
+        await db.deliveries.insert_many([
+            {"client_id": client_id, "seq": message["seq"], "message": message, "created_at": now}
+            for message in stamped
+        ])
+        return stamped
+
+    async def missed(self, client_id: str, cursor: int) -> list:
+        db = get_database()
+        entries = db.deliveries.find(
+            {"client_id": client_id, "seq": {"$gt": cursor}}, {"message": 1, "_id": 0}
+        ).sort("seq", 1).limit(REPLAY_LIMIT)
+        return [entry["message"] async for entry in entries]
+
+    async def compact(self, client_id: str, cursor: int):
+        # The client has confirmed everything up to `cursor`
+        await get_database().deliveries.delete_many({"client_id": client_id, "seq": {"$lte": cursor}})
+
+
+delivery_log = DeliveryLog()
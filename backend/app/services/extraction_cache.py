@@ -0,0 +1,178 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import hashlib
+import logging
+import os
+import re
+import time
+import pytz
+from app.config.database import get_database
+from app.services.rule_extractor import CLOCK_PATTERN, DAY_PATTERN, RELATIVE_PATTERN
+
+INDIA_TZ = pytz.timezone("Asia/Kolkata")
+
+logger = logging.getLogger(__name__)
+
+# Clock times the timing rules in prompts.SYSTEM_PROMPT snap "today"/"tomorrow" to
+SNAP_HOURS = {6, 13, 16, 20}
+
+# (first hour, name) of each window the timing rules distinguish; any two
+# base times in the same window get the same answer from the prompt.
+TIME_BUCKETS = [(0, "late-night"), (1, "early-morning"), (6, "morning"),
+                (13, "afternoon"), (16, "evening"), (20, "night")]
+
+def normalize_message(message: str) -> str:
+    message = re.sub(r"\s+", " ", message.lower()).strip()
+    return message.rstrip(".!?")
+
+def time_bucket(base_time: datetime) -> str:
+    hour = base_time.astimezone(INDIA_TZ).hour
+    name = TIME_BUCKETS[0][1]
+    for start, bucket in TIME_BUCKETS:
+        if hour >= start:
+            name = bucket
+    return name
+
+def _relativize(item: dict, base_time: datetime, message: str):
+    """Turn an LLM item into a base-time independent entry, or None.
+
+    Whether a time is kept as a day and clock time or as an offset from
+    now depends on how the message phrased it: "today"/"tomorrow" snap to
+    the wall clock, "in 5 hours" does not, even when it lands on 13:00.
+    """
+    try:
+        target = datetime.fromisoformat(item["remind_at"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if "UNTIL=" in str(item.get("recurrence", "")).upper():
+        # A recurrence with an absolute end would be stale on a later hit
+        return None
+    if CLOCK_PATTERN.search(message):
+        # "at 5 pm" means a different offset at every base time
+        return None
+    target = INDIA_TZ.localize(target) if target.tzinfo is None else target.astimezone(INDIA_TZ)
+    base = base_time.astimezone(INDIA_TZ)
+    entry = {k: v for k, v in item.items() if k != "remind_at"}
+    snapped = target.hour in SNAP_HOURS and target.minute == 0 and target.second == 0
+    day, relative = DAY_PATTERN.search(message), RELATIVE_PATTERN.search(message)
+    if snapped and day and relative:
+        # Either phrase could have produced this time
+        return None
+    if snapped and day:
+        entry["anchor"] = "day"
+        entry["days"] = (target.date() - base.date()).days
+        entry["clock"] = target.strftime("%H:%M:%S")
+    else:
+        entry["anchor"] = "now"
+        entry["offset"] = (target - base).total_seconds()
+    return entry
+
+def _anchor(entry: dict, base_time: datetime) -> dict:
+    base = base_time.astimezone(INDIA_TZ)
+    item = {k: v for k, v in entry.items() if k not in ("anchor", "days", "clock", "offset")}
+    if entry["anchor"] == "day":
+        day = base.date() + timedelta(days=entry["days"])
+        clock = datetime.strptime(entry["clock"], "%H:%M:%S").time()
+        target = INDIA_TZ.localize(datetime.combine(day, clock))
+    else:
+        target = base + timedelta(seconds=entry["offset"])
+    item["remind_at"] = target.isoformat()
+    return item
+
+
+class ExtractionCache:
+    """LRU + TTL memo of LLM extractions keyed on message and time bucket.
+
+    Entries hold times relative to the base time they were extracted at and
+    are re-anchored to the caller's base time on a hit. With `persist`, the
+    `extraction_cache` collection backs the in-memory map so entries survive
+    restarts and are shared between workers.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, persist: bool = False):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, message: str, base_time: datetime) -> str:
+        raw = f"{time_bucket(base_time)}|{normalize_message(message)}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    async def get(self, message: str, base_time: datetime):
+        key = self.key(message, base_time)
+        entries = self._get_local(key)
+        if entries is None and self.persist:
+            entries = await self._get_persisted(key)
+        if entries is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [_anchor(entry, base_time) for entry in entries]
+
+    async def put(self, message: str, base_time: datetime, items: list):
+        entries = [_relativize(item, base_time, message) for item in items]
+        if not entries or any(entry is None for entry in entries):
+            return
+        key = self.key(message, base_time)
+        self._put_local(key, entries, time.monotonic() + self.ttl_seconds)
+        if self.persist:
+            await self._put_persisted(key, entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _get_local(self, key):
+        found = self._entries.get(key)
+        if found is None:
+            return None
+        expires, entries = found
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entries
+
+    def _put_local(self, key, entries, expires):
+        self._entries[key] = (expires, entries)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_persisted(self, key):
+        try:
+            doc = await get_database().extraction_cache.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+            )
+        except Exception as e:
+            logger.warning("[Extraction Cache] Lookup failed: %s", e)
+            return None
+        if doc is None:
+            return None
+        remaining = (doc["expires_at"].replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).total_seconds()
+        self._put_local(key, doc["entries"], time.monotonic() + remaining)
+        return doc["entries"]
+
+    async def _put_persisted(self, key, entries):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        try:
+            await get_database().extraction_cache.replace_one(
+                {"_id": key}, {"entries": entries, "expires_at": expires_at}, upsert=True
+            )
+        except Exception as e:
+            logger.warning("[Extraction Cache] Write failed: %s", e)
+
+
+extraction_cache = ExtractionCache(
+    max_entries=int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", 10000)),
+    ttl_seconds=float(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", 6 * 3600)),
+    persist=os.getenv("EXTRACTION_CACHE_PERSIST", "false").lower() == "true",
+)
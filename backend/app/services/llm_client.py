@@ -0,0 +1,79 @@
+from mistralai.async_client import MistralAsyncClient
+from mistralai.exceptions import MistralAPIException, MistralConnectionException
+from mistralai.models.chat_completion import ChatMessage
+import asyncio
+import logging
+import os
+import random
+from app.services.metrics import metrics, span
+from app.services.prompts import estimate_tokens
+
+MODEL = os.getenv("MISTRAL_MODEL", "mistral-large-latest")
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 30))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", 0.5))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+llm_requests = metrics.counter("llm_requests_total", "LLM attempts by outcome (ok, retry, error)")
+prompt_tokens = metrics.histogram(
+    "llm_prompt_tokens", "Prompt tokens per LLM request, as reported (usage) or estimated", buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 5000)
+)
+
+client = MistralAsyncClient(
+    api_key=os.getenv("MISTRAL_API_KEY"),
+    max_retries=0,
+    timeout=int(TIMEOUT_SECONDS),
+    max_concurrent_requests=MAX_CONCURRENCY,
+)
+
+# Caps LLM calls in flight across every WebSocket connection on this worker.
+_limiter = asyncio.Semaphore(MAX_CONCURRENCY)
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, MistralConnectionException)):
+        return True
+    return isinstance(error, MistralAPIException) and error.http_status in RETRY_STATUS_CODES
+
+async def complete_json(prompt: str, system: str = None) -> str:
+    """Send one prompt and return the raw JSON content of the reply.
+
+    `system` goes first as its own message so the unchanging part of the
+    prompt is an identical prefix on every request.
+
+    Runs on the async client under the global limiter, with a per-attempt
+    timeout and exponential backoff on timeouts, 429s and 5xx responses.
+    """
+    messages = [ChatMessage(role="user", content=prompt)]
+    if system:
+        messages.insert(0, ChatMessage(role="system", content=system))
+    attempt = 0
+    while True:
+        try:
+            async with _limiter:
+                with span("llm_call"):
+                    response = await asyncio.wait_for(
+                        client.chat(
+                            model=MODEL,
+                            messages=messages,
+                            response_format={"type": "json_object"}
+                        ),
+                        timeout=TIMEOUT_SECONDS,
+                    )
+            llm_requests.inc(outcome="ok")
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                prompt_tokens.observe(usage.prompt_tokens, source="usage")
+            else:
+                prompt_tokens.observe(estimate_tokens((system or "") + prompt), source="estimate")
+            return response.choices[0].message.content
+        except Exception as e:
+            if attempt >= MAX_RETRIES or not _is_retryable(e):
+                llm_requests.inc(outcome="error")
+                raise
+            llm_requests.inc(outcome="retry")
+            delay = BACKOFF_SECONDS * (2 ** attempt) * (1 + random.random())
+            attempt += 1
+            logger.info("[LLM] Retry %d/%d in %.2fs after: %r", attempt, MAX_RETRIES, delay, e)
+            await asyncio.sleep(delay)
@@ -0,0 +1,127 @@
+from contextlib import contextmanager
+import time
+
+# Latency buckets in seconds, from a regex check up to a slow LLM reply
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_text(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.type = "counter"
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield self.name, key, value
+
+
+class Gauge:
+    """A value that is either set directly or read from `function` on scrape."""
+
+    def __init__(self, name: str, help: str, function=None):
+        self.name = name
+        self.help = help
+        self.type = "gauge"
+        self.function = function
+        self._value = 0.0
+
+    def set(self, value: float):
+        self._value = value
+
+    def samples(self):
+        value = self.function() if self.function else self._value
+        yield self.name, (), 0.0 if value is None else value
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.type = "histogram"
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        series[1] += 1
+        series[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        for key, (counts, count, total) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", key + (("le", repr(float(bound))),), cumulative
+            yield f"{self.name}_bucket", key + (("le", "+Inf"),), count
+            yield f"{self.name}_count", key, count
+            yield f"{self.name}_sum", key, total
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter(name, help))
+
+    def gauge(self, name: str, help: str, function=None) -> Gauge:
+        return self._register(Gauge(name, help, function))
+
+    def histogram(self, name: str, help: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, buckets))
+
+    def render(self) -> str:
+        """Everything registered, in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        # Re-registering a name returns the existing metric
+        return self._metrics.setdefault(metric.name, metric)
+
+
+metrics = MetricsRegistry()
+
+# Wall time of each step a chat message goes through, labelled by stage:
+# keyword_gate, llm_call, json_parse, db_write, ws_send
+stage_seconds = metrics.histogram("reminder_stage_seconds", "Time spent in each stage of reminder handling")
+
+def span(stage: str):
+    """Time the enclosed block into reminder_stage_seconds{stage=...}."""
+    return stage_seconds.time(stage=stage)
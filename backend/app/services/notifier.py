@@ -0,0 +1,373 @@
+import asyncio
+import collections
+import glob
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from app.services.metrics import metrics, span
+
+CHANNEL = "reminder_notifications"
+
+# Per-connection outbound limits for published frames
+RATE_PER_SECOND = float(os.getenv("NOTIFY_RATE_PER_SECOND", 5))
+BURST = int(os.getenv("NOTIFY_BURST", 10))
+MAX_QUEUE = int(os.getenv("NOTIFY_MAX_QUEUE", 256))
+# Connections enqueued before a broadcast yields to the event loop
+FANOUT_BATCH = 500
+# Tasks spelled out in a digest's summary line
+SUMMARY_TASKS = 3
+# Tries at an IPC send while the receiving worker's queue is full
+IPC_SEND_ATTEMPTS = 8
+
+logger = logging.getLogger(__name__)
+messages_sent = metrics.counter("ws_messages_sent_total", "Frames sent to WebSocket clients, by type")
+frames_dropped = metrics.counter("ws_frames_dropped_total", "Queued non-notification frames dropped because a connection fell behind")
+frames_merged = metrics.counter("ws_frames_merged_total", "Frames folded into one of the same type already queued, by type")
+
+async def send_json(websocket, message: dict):
+    # Every server -> client frame goes through here so sends are timed
+    with span("ws_send"):
+        await websocket.send_json(message)
+    messages_sent.inc(type=message.get("type", "unknown"))
+
+
+def notification_message(tasks: list) -> dict:
+    """One notification frame for any number of due tasks.
+
+    `task` stays a single display string (the task itself, or a summary for a
+    digest) for clients that predate `tasks`.
+    """
+    if len(tasks) == 1:
+        summary = tasks[0]
+    else:
+        summary = f"{len(tasks)} reminders due: " + "; ".join(tasks[:SUMMARY_TASKS])
+        if len(tasks) > SUMMARY_TASKS:
+            summary += f" and {len(tasks) - SUMMARY_TASKS} more"
+    return {"type": "notification", "task": summary, "tasks": list(tasks)}
+
+def merge_notifications(first: dict, second: dict) -> dict:
+    merged = notification_message(first.get("tasks", [first.get("task")]) + second.get("tasks", [second.get("task")]))
+    seqs = [m["seq"] for m in (first, second) if m.get("seq") is not None]
+    if seqs:
+        merged["seq"] = max(seqs)
+    return merged
+
+def merge_changes(first: dict, second: dict) -> dict:
+    """Fold two reminder_changed frames into one.
+
+    If either one only lists ids, so does the result; otherwise each
+    reminder keeps its newest version and deletions win.
+    """
+    version = max(first["version"], second["version"])
+    if "ids" in first or "ids" in second:
+        ids = {}
+        for frame in (first, second):
+            changed = frame.get("ids") or [doc["_id"] for doc in frame.get("upserted", [])] + frame.get("deleted", [])
+            ids.update(dict.fromkeys(changed))
+        return {"type": "reminder_changed", "version": version, "ids": list(ids)}
+    deleted = dict.fromkeys(first["deleted"] + second["deleted"])
+    upserted = {}
+    for doc in first["upserted"] + second["upserted"]:
+        current = upserted.get(doc["_id"])
+        if doc["_id"] not in deleted and (current is None or current.get("version", 0) <= doc.get("version", 0)):
+            upserted[doc["_id"]] = doc
+    return {"type": "reminder_changed", "version": version, "upserted": list(upserted.values()), "deleted": list(deleted)}
+
+# Frame types a connection keeps at most one of in its queue; a newer one
+# is folded into the one already waiting
+MERGERS = {"notification": merge_notifications, "reminder_changed": merge_changes}
+
+
+class ConnectionSender:
+    """Outbound queue for one socket, drained at no more than `rate` frames/s.
+
+    Publishing only appends to the queue, so a slow or stalled client never
+    holds up the caller. A notification that arrives while another is still
+    queued is folded into it, so a burst of due reminders reaches the client
+    as one digest; reminder_changed frames are collapsed the same way.
+    """
+
+    def __init__(self, websocket, rate: float, burst: int, max_queue: int):
+        self.websocket = websocket
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self._queue = collections.deque()
+        # Queued frame of each MERGERS type, if any
+        self._mergeable = {}
+        self._ready = asyncio.Event()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+
+    def send(self, message: dict):
+        kind = message.get("type")
+        queued = self._mergeable.get(kind)
+        if queued is not None:
+            # Updated in place so it keeps its position in the queue
+            merged = MERGERS[kind](queued, message)
+            queued.clear()
+            queued.update(merged)
+            frames_merged.inc(type=kind)
+        else:
+            if kind in MERGERS:
+                # The same frame is published to every socket; copy before it can change
+                message = dict(message)
+                self._mergeable[kind] = message
+            self._queue.append(message)
+            if len(self._queue) > self.max_queue:
+                self._drop_oldest()
+        self._ready.set()
+
+    def _drop_oldest(self):
+        # Notifications are never dropped. Any other frame can be: a client
+        # catches up on reminder changes with ?since=N.
+        for index, frame in enumerate(self._queue):
+            if frame.get("type") != "notification":
+                del self._queue[index]
+                if self._mergeable.get(frame.get("type")) is frame:
+                    del self._mergeable[frame["type"]]
+                frames_dropped.inc()
+                return
+
+    def close(self):
+        self._task.cancel()
+
+    def __len__(self):
+        return len(self._queue)
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            while self._queue:
+                await self._take_token()
+                message = self._queue.popleft()
+                if self._mergeable.get(message.get("type")) is message:
+                    del self._mergeable[message["type"]]
+                try:
+                    await send_json(self.websocket, message)
+                except Exception as e:
+                    logger.warning("[WebSocket Error] Failed to send notification: %s", e)
+            self._ready.clear()
+
+    async def _take_token(self):
+        # Token bucket: `burst` frames at once, then one every 1/rate seconds
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens < 1:
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+            self._tokens, self._updated = 1.0, time.monotonic()
+        self._tokens -= 1
+
+
+class ConnectionRegistry:
+    """Live WebSockets on this worker, keyed by client (user/session) id.
+
+    Each socket gets a ConnectionSender for frames published to it.
+    """
+
+    def __init__(self, rate: float = RATE_PER_SECOND, burst: int = BURST, max_queue: int = MAX_QUEUE):
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self._connections = {}
+
+    def add(self, client_id: str, websocket):
+        sender = ConnectionSender(websocket, self.rate, self.burst, self.max_queue)
+        self._connections.setdefault(client_id, {})[websocket] = sender
+
+    def remove(self, client_id: str, websocket):
+        sockets = self._connections.get(client_id)
+        if sockets is None:
+            return
+        sender = sockets.pop(websocket, None)
+        if sender:
+            sender.close()
+        if not sockets:
+            del self._connections[client_id]
+
+    def senders(self, client_id=None) -> list:
+        # No client id (reminders created before ids existed) means everyone
+        if client_id is None:
+            return [sender for sockets in self._connections.values() for sender in sockets.values()]
+        return list(self._connections.get(client_id, {}).values())
+
+    def connections(self, client_id=None) -> list:
+        return [sender.websocket for sender in self.senders(client_id)]
+
+    def queued(self) -> int:
+        return sum(len(sender) for sender in self.senders())
+
+    def __len__(self):
+        return sum(len(sockets) for sockets in self._connections.values())
+
+
+class InProcessBackend:
+    """Single-worker backend: published messages are delivered directly."""
+
+    async def start(self, on_message):
+        self.on_message = on_message
+
+    async def publish(self, envelope: dict):
+        await self.on_message(envelope)
+
+    async def stop(self):
+        pass
+
+
+class LocalIPCBackend:
+    """Fan-out between workers on one host over Unix datagram sockets.
+
+    Every worker binds a socket in `directory` and publishing sends the
+    envelope to each socket found there, including its own.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{uuid.uuid4().hex}.sock")
+        self._transport = None
+        self._sender = None
+
+    async def start(self, on_message):
+        os.makedirs(self.directory, exist_ok=True)
+        loop = asyncio.get_running_loop()
+
+        class Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                try:
+                    envelope = json.loads(data)
+                except ValueError:
+                    return
+                loop.create_task(on_message(envelope))
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.path)
+        self._transport, _ = await loop.create_datagram_endpoint(Protocol, sock=sock)
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+
+    async def publish(self, envelope: dict):
+        data = json.dumps(envelope).encode()
+        for path in glob.glob(os.path.join(self.directory, "*.sock")):
+            await self._send(data, path)
+
+    async def _send(self, data: bytes, path: str):
+        for attempt in range(IPC_SEND_ATTEMPTS):
+            try:
+                self._sender.sendto(data, path)
+                return
+            except BlockingIOError:
+                # The worker's receive queue is full; back off while it drains
+                await asyncio.sleep(0.001 * 2 ** attempt)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Socket left behind by a worker that exited
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                return
+            except OSError as e:
+                logger.warning("[Notifier] IPC send to %s failed: %s", path, e)
+                return
+        logger.warning("[Notifier] IPC send to %s dropped after %d attempts", path, IPC_SEND_ATTEMPTS)
+
+    async def stop(self):
+        if self._transport:
+            self._transport.close()
+        if self._sender:
+            self._sender.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class RedisBackend:
+    """Fan-out across hosts over Redis pub/sub.
+
+    Requires the optional `redis` package unless a client is passed in,
+    which also lets tests substitute a stub.
+    """
+
+    def __init__(self, url: str = None, client=None):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError("NOTIFY_BACKEND=redis requires the 'redis' package")
+            client = redis.from_url(url)
+        self.client = client
+        self._pubsub = None
+        self._listener = None
+
+    async def start(self, on_message):
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(CHANNEL)
+
+        async def listen():
+            async for item in pubsub.listen():
+                if item.get("type") != "message":
+                    continue
+                try:
+                    envelope = json.loads(item["data"])
+                except ValueError:
+                    continue
+                await on_message(envelope)
+
+        self._pubsub = pubsub
+        self._listener = asyncio.create_task(listen())
+
+    async def publish(self, envelope: dict):
+        await self.client.publish(CHANNEL, json.dumps(envelope))
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+        if self._pubsub:
+            await self._pubsub.unsubscribe(CHANNEL)
+
+
+def backend_from_env():
+    kind = os.getenv("NOTIFY_BACKEND", "inprocess").lower()
+    if kind == "ipc":
+        return LocalIPCBackend(os.getenv("NOTIFY_IPC_DIR", "/tmp/reminder-notify"))
+    if kind == "redis":
+        return RedisBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    return InProcessBackend()
+
+
+class Notifier:
+    """Publishes notifications for a client id and delivers the ones this
+    worker receives to that client's local sockets."""
+
+    def __init__(self, registry: ConnectionRegistry):
+        self.registry = registry
+        self.backend = None
+
+    async def start(self, backend=None):
+        self.backend = backend or backend_from_env()
+        await self.backend.start(self._deliver)
+
+    async def stop(self):
+        if self.backend:
+            await self.backend.stop()
+
+    async def notify(self, client_id, message: dict):
+        await self.backend.publish({"client_id": client_id, "message": message})
+
+    async def _deliver(self, envelope: dict):
+        # Only enqueues; every connection's sender writes at its own pace.
+        # Large broadcasts yield to the loop every FANOUT_BATCH connections.
+        message = envelope.get("message")
+        for count, sender in enumerate(self.registry.senders(envelope.get("client_id")), 1):
+            sender.send(message)
+            if count % FANOUT_BATCH == 0:
+                await asyncio.sleep(0)
+
+
+registry = ConnectionRegistry()
+notifier = Notifier(registry)
@@ -0,0 +1,53 @@
+import collections
+import os
+import sys
+import threading
+
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack every `interval_seconds`.
+
+    Runs on its own thread, so the loop pays nothing beyond the GIL handoff.
+    Stacks are kept in collapsed form ("outer;inner;leaf count"), which
+    flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, interval_seconds: float, max_depth: int = 64):
+        self.interval_seconds = interval_seconds
+        self.max_depth = max_depth
+        self.samples = collections.Counter()
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # Called from the loop thread, which is the one that gets sampled
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def collapsed(self, limit: int = 200) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common(limit))
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+
+# Off unless PROFILE_INTERVAL_MS is set; 10ms is a reasonable starting point
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 0))
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000) if PROFILE_INTERVAL_MS > 0 else None
@@ -0,0 +1,145 @@
+from datetime import datetime
+import json
+import math
+import os
+import pytz
+from app.services.rule_extractor import (
+    CATEGORY_PATTERNS, DAY_PATTERN, EVERY_PATTERN, FREQUENCY_PATTERN, RELATIVE_PATTERN, token_pattern,
+)
+
+INDIA_TZ = pytz.timezone("Asia/Kolkata")
+
+# Few-shot examples sent with one message; the best matches are picked
+MAX_EXAMPLES = int(os.getenv("PROMPT_MAX_EXAMPLES", 2))
+
+# Identical for every request, so it is sent as the system message and the
+# provider can reuse it as a cached prefix. Everything that depends on the
+# message or the clock goes in the user part.
+SYSTEM_PROMPT = """You extract actionable medical tasks from a doctor's chat message and schedule reminders.
+
+Rules:
+- Extract every medical instruction, order or note that needs future action, follow-up or monitoring, even without "remind me". Ignore non-medical chat.
+- One item per task. Write complete, clear task descriptions and keep patient identifiers (bed number, name).
+- Times are IST (+05:30), computed from the Current Time given with the message.
+
+Timing:
+- "today": 06:00-12:59 -> 13:00; 13:00-15:59 or before 06:00 -> 16:00; 16:00-19:59 -> 20:00 the same day; from 20:00 -> 13:00 the next day.
+- "tomorrow": 06:00 the next day.
+- Relative ("in 2 hours", "after 30 minutes", "in 3 days"): Current Time plus that amount.
+- No time given: Current Time + 1 hour. Urgent with no time: Current Time + 15 minutes.
+
+Output: a JSON array of objects with
+- "task": the task description
+- "remind_at": ISO datetime with +05:30
+- "priority": "high", "medium" or "low" by clinical urgency
+- "category": lab, imaging, medication, procedure, monitoring or another short category
+- "recurrence": only for repeating orders ("every 2 hours", QID, BID), an RRULE such as "FREQ=HOURLY;INTERVAL=2;UNTIL=20240710T060000" in local time; omit otherwise"""
+
+ABBREVIATIONS = {
+    "OT": "Operation Theatre", "Hb": "Hemoglobin", "Tc": "Total Count (WBC count)",
+    "S.Creat": "Serum Creatinine", "DM": "Diabetes Mellitus", "HTN": "Hypertension",
+    "Foleys": "Foley's Catheter", "BP": "Blood Pressure", "HR": "Heart Rate", "RR": "Respiratory Rate",
+    "O2 Sat": "Oxygen Saturation", "IV": "Intravenous", "IM": "Intramuscular",
+    "PO": "Per Oral (by mouth)", "PRN": "As needed", "QID": "Four times daily",
+    "TID": "Three times daily", "BID": "Twice daily", "NPO": "Nothing by mouth",
+    "DVT": "Deep Vein Thrombosis", "ICU": "Intensive Care Unit", "CCU": "Coronary Care Unit",
+    "ECG": "Electrocardiogram", "EKG": "Electrocardiogram", "CT": "Computed Tomography",
+    "MRI": "Magnetic Resonance Imaging", "X-ray": "Radiograph",
+}
+ABBREVIATION_PATTERNS = {term: token_pattern([term]) for term in ABBREVIATIONS}
+
+# `tags` are matched against what is detected in the message: categories
+# from the rule extractor plus "today", "tomorrow", "relative", "recurring".
+EXAMPLES = [
+    {
+        "tags": {"lab", "procedure", "today", "tomorrow"},
+        "time": "2024-07-09T10:30:00+05:30",
+        "input": "Patient in bed 5 needs blood culture and urine culture collected today. Schedule for SETON removal tomorrow in OT 7",
+        "output": [
+            {"task": "Collect blood culture and urine culture for patient in bed 5", "remind_at": "2024-07-09T13:00:00+05:30", "priority": "high", "category": "lab"},
+            {"task": "Schedule SETON removal in OT 7", "remind_at": "2024-07-10T06:00:00+05:30", "priority": "medium", "category": "procedure"},
+        ],
+    },
+    {
+        "tags": {"monitoring", "lab", "relative", "today"},
+        "time": "2024-07-09T14:00:00+05:30",
+        "input": "Check patient's sugars after two hours. Send Hb, Tc, S.Creat today",
+        "output": [
+            {"task": "Check patient's blood sugar levels", "remind_at": "2024-07-09T16:00:00+05:30", "priority": "medium", "category": "monitoring"},
+            {"task": "Send Hb, Tc, S.Creat lab orders", "remind_at": "2024-07-09T16:00:00+05:30", "priority": "medium", "category": "lab"},
+        ],
+    },
+    {
+        "tags": {"procedure", "relative"},
+        "time": "2024-07-09T09:00:00+05:30",
+        "input": "Remove Foleys after clamping for 4 hours",
+        "output": [
+            {"task": "Remove Foley's catheter after clamping", "remind_at": "2024-07-09T13:00:00+05:30", "priority": "high", "category": "procedure"},
+        ],
+    },
+    {
+        "tags": {"monitoring", "recurring"},
+        "time": "2024-07-09T21:00:00+05:30",
+        "input": "Monitor BP every 2 hours overnight",
+        "output": [
+            {"task": "Monitor blood pressure every 2 hours overnight", "remind_at": "2024-07-09T23:00:00+05:30", "priority": "high", "category": "monitoring", "recurrence": "FREQ=HOURLY;INTERVAL=2;UNTIL=20240710T060000"},
+        ],
+    },
+]
+
+
+def estimate_tokens(text: str) -> int:
+    # About four characters per token for English text with Mistral's tokenizer
+    return math.ceil(len(text) / 4)
+
+def detect_tags(message: str) -> set:
+    tags = {category for category, pattern in CATEGORY_PATTERNS.items() if pattern.search(message)}
+    for day in DAY_PATTERN.finditer(message):
+        tags.add(day.group(1).lower())
+    if RELATIVE_PATTERN.search(message):
+        tags.add("relative")
+    if EVERY_PATTERN.search(message) or FREQUENCY_PATTERN.search(message):
+        tags.add("recurring")
+    return tags
+
+def select_abbreviations(messages: list) -> dict:
+    return {term: meaning for term, meaning in ABBREVIATIONS.items()
+            if any(ABBREVIATION_PATTERNS[term].search(m) for m in messages)}
+
+def select_examples(tags: set, limit: int = MAX_EXAMPLES) -> list:
+    """Examples sharing the most tags with the message; at least one is always sent."""
+    scored = sorted(EXAMPLES, key=lambda example: len(example["tags"] & tags), reverse=True)
+    chosen = [example for example in scored[:limit] if example["tags"] & tags]
+    return chosen or scored[:1]
+
+def _context(messages: list, base_time: datetime) -> str:
+    tags = set().union(*(detect_tags(m) for m in messages))
+    lines = []
+    abbreviations = select_abbreviations(messages)
+    if abbreviations:
+        lines.append("Abbreviations: " + "; ".join(f"{term} = {meaning}" for term, meaning in abbreviations.items()))
+        lines.append("")
+    lines.append("Examples:")
+    for example in select_examples(tags):
+        lines.append(f"Current Time: {example['time']}")
+        lines.append(f"Input: {json.dumps(example['input'])}")
+        lines.append(f"Output: {json.dumps(example['output'])}")
+        lines.append("")
+    lines.append(f"Current Time: {base_time.astimezone(INDIA_TZ).isoformat(timespec='seconds')}")
+    return "\n".join(lines)
+
+def build_prompt(message: str, base_time: datetime) -> str:
+    """Per-message user part: only the abbreviations and examples it needs."""
+    return _context([message], base_time) + f"\nInput: {json.dumps(message)}\nOutput:"
+
+def build_batch_prompt(messages: list, base_time: datetime) -> str:
+    # One request for several messages; shared context is sent once.
+    numbered = "\n".join(f"{i}. {json.dumps(m)}" for i, m in enumerate(messages, 1))
+    return _context(messages, base_time) + f"""
+The following {len(messages)} messages are independent. Extract tasks from each one separately.
+Return a JSON object {{"results": [...]}} where "results" has exactly {len(messages)} entries,
+in the same order as the messages, and each entry is the JSON array of tasks for that message
+(an empty array if it has none).
+
+Messages:
+{numbered}"""
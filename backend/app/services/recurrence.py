@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import islice
+from dateutil.parser import isoparse
+from dateutil.rrule import rrulestr
+import logging
+import os
+import pytz
+from app.services.rule_extractor import parse_recurrence
+
+INDIA_TZ = pytz.timezone("Asia/Kolkata")
+
+# Series with no end of their own stop after DEFAULT_HOURS, and no series
+# runs for longer than MAX_DAYS
+DEFAULT_HOURS = float(os.getenv("RECURRENCE_DEFAULT_HOURS", 24))
+MAX_DAYS = float(os.getenv("RECURRENCE_MAX_DAYS", 30))
+# Upcoming occurrences listed with each recurring reminder
+PREVIEW = int(os.getenv("RECURRENCE_PREVIEW", 5))
+
+logger = logging.getLogger(__name__)
+
+# A recurring reminder is still one document. `reminder_time` holds its next
+# occurrence, and `recurrence` holds the rule that produces the ones after it:
+#   {"rule": "FREQ=HOURLY;INTERVAL=2", "start": UTC datetime, "until": UTC datetime}
+# Occurrences are never stored; they are computed from the rule when needed.
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+@lru_cache(maxsize=1024)
+def _series(rule: str, start: datetime, until: datetime):
+    # Expanded in IST so DAILY/BYHOUR rules follow the ward's clock
+    return rrulestr(rule, dtstart=start.astimezone(INDIA_TZ)).replace(until=until.astimezone(INDIA_TZ))
+
+def series(recurrence: dict):
+    return _series(recurrence["rule"], _utc(recurrence["start"]), _utc(recurrence["until"]))
+
+def build_recurrence(rule: str, start: datetime, until: datetime = None):
+    """Validate an RRULE and return the stored `recurrence` document.
+
+    COUNT and UNTIL in the rule are turned into the `until` bound. A series
+    with no bound gets DEFAULT_HOURS, and every series is capped at MAX_DAYS.
+    Raises ValueError for rules dateutil cannot parse. Returns None when no
+    occurrence falls after `start`.
+    """
+    start = _utc(start)
+    parts = {}
+    for part in rule.strip().upper().removeprefix("RRULE:").split(";"):
+        if part:
+            key, _, value = part.partition("=")
+            parts[key] = value
+    count = parts.pop("COUNT", None)
+    rule_until = parts.pop("UNTIL", None)
+    parts.pop("DTSTART", None)
+    rule = ";".join(f"{key}={value}" for key, value in parts.items())
+    unbounded = rrulestr(rule, dtstart=start.astimezone(INDIA_TZ))
+
+    if until is None and rule_until:
+        until = isoparse(rule_until)
+        if until.tzinfo is None:
+            until = INDIA_TZ.localize(until)
+    if until is None and count:
+        occurrences = list(islice(unbounded, int(count)))
+        until = occurrences[-1] if occurrences else start
+    if until is None:
+        until = start + timedelta(hours=DEFAULT_HOURS)
+    until = min(_utc(until), start + timedelta(days=MAX_DAYS))
+    recurrence = {"rule": rule, "start": start, "until": until}
+    if series(recurrence).after(start.astimezone(INDIA_TZ)) is None:
+        return None
+    return recurrence
+
+def recurrence_for(item: dict, start: datetime):
+    """Recurrence of one extracted task, from the LLM's "recurrence" field or
+    from phrases like "every 2 hours" and "QID" in the task text."""
+    try:
+        if item.get("recurrence"):
+            return build_recurrence(str(item["recurrence"]), start)
+        parsed = parse_recurrence(item.get("task", ""), start)
+        if parsed:
+            return build_recurrence(parsed[0], start, parsed[1])
+    except (ValueError, TypeError) as e:
+        logger.warning("[Recurrence] Ignoring rule for %r: %s", item.get("task"), e)
+    return None
+
+def next_occurrence(recurrence: dict, after: datetime):
+    """First occurrence strictly after `after` (UTC), or None once the series has ended."""
+    following = series(recurrence).after(_utc(after).astimezone(INDIA_TZ))
+    return following.astimezone(timezone.utc) if following else None
+
+def upcoming(recurrence: dict, start: datetime, end: datetime = None, limit: int = PREVIEW) -> list:
+    """Up to `limit` occurrences in [start, end), expanded on the fly."""
+    occurrences = []
+    for occurrence in series(recurrence).xafter(_utc(start).astimezone(INDIA_TZ), count=limit, inc=True):
+        occurrence = occurrence.astimezone(timezone.utc)
+        if end is not None and occurrence >= _utc(end):
+            break
+        occurrences.append(occurrence)
+    return occurrences
@@ -0,0 +1,121 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+from pymongo import ReturnDocument
+from app.models.reminder import reminder_to_json
+from app.services.notifier import notifier
+
+# Every create, toggle or delete takes the next value of one global counter
+# and stores it on the reminder (or its tombstone), so clients can ask for
+# "everything after version N".
+COUNTER_ID = "reminders"
+
+# Versions handed out but not yet written stay listed on the counter until
+# the write finishes, and no reader reports a version at or past the oldest
+# of them. Entries older than this belong to writers that died.
+LEASE_SECONDS = float(os.getenv("VERSION_LEASE_SECONDS", 30))
+
+# Larger changes are pushed as ids only, in frames of IDS_PER_FRAME, and
+# clients fetch the documents with GET /reminders?since=N
+INLINE_CHANGES = int(os.getenv("NOTIFY_INLINE_CHANGES", 50))
+IDS_PER_FRAME = 1000
+
+logger = logging.getLogger(__name__)
+
+
+async def allocate_versions(db, count: int = 1) -> int:
+    """Reserve `count` consecutive versions and return the first one.
+
+    The reservation holds back committed_version() until release_versions()
+    is called; reserve_versions() pairs the two around a write.
+    """
+    live = {"$filter": {
+        "input": {"$ifNull": ["$inflight", []]},
+        "cond": {"$gt": ["$$this.at", {"$subtract": ["$$NOW", int(LEASE_SECONDS * 1000)]}]},
+    }}
+    counter = await db.counters.find_one_and_update(
+        {"_id": COUNTER_ID},
+        [{"$set": {
+            "version": {"$add": [{"$ifNull": ["$version", 0]}, count]},
+            "inflight": {"$concatArrays": [live, [
+                {"first": {"$add": [{"$ifNull": ["$version", 0]}, 1]}, "at": "$$NOW"},
+            ]]},
+        }}],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return counter["version"] - count + 1
+
+async def release_versions(db, first: int):
+    try:
+        await db.counters.update_one({"_id": COUNTER_ID}, {"$pull": {"inflight": {"first": first}}})
+    except Exception as e:
+        # The lease runs out on its own
+        logger.warning("[Versions] Failed to release version %s: %s", first, e)
+
+@asynccontextmanager
+async def reserve_versions(db, count: int = 1):
+    """Allocate versions for one write and release them once it has finished."""
+    first = await allocate_versions(db, count)
+    try:
+        yield first
+    finally:
+        await release_versions(db, first)
+
+async def committed_version(db) -> int:
+    """Highest version at or below which every write is visible to readers."""
+    counter = await db.counters.find_one({"_id": COUNTER_ID})
+    if not counter:
+        return 0
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=LEASE_SECONDS)
+    pending = [entry["first"] - 1 for entry in counter.get("inflight", [])
+               if entry["at"].replace(tzinfo=timezone.utc) > cutoff]
+    return min([counter["version"], *pending])
+
+async def record_deletions(db, ids: list) -> int:
+    """Write tombstones for deleted reminders; returns the version used."""
+    if not ids:
+        return await committed_version(db)
+    now = datetime.now(timezone.utc)
+    async with reserve_versions(db) as version:
+        await db.reminder_tombstones.insert_many([
+            {"reminder_id": str(reminder_id), "version": version, "deleted_at": now} for reminder_id in ids
+        ])
+    return version
+
+async def changes_since(db, since: int) -> dict:
+    """Reminders created/changed and ids deleted after version `since`.
+
+    `version` is where the caller should ask from next time. It is read
+    before the changes, so a write still in flight is fetched again later
+    instead of being skipped.
+    """
+    version = max(since, await committed_version(db))
+    upserted = db.reminders.find({"version": {"$gt": since}}).sort("version", 1)
+    deleted = db.reminder_tombstones.find({"version": {"$gt": since}}, {"reminder_id": 1}).sort("version", 1)
+    return {
+        "version": version,
+        "upserted": [reminder_to_json(doc) async for doc in upserted],
+        "deleted": [doc["reminder_id"] async for doc in deleted],
+    }
+
+async def publish_changes(version: int, upserted: list = (), deleted: list = ()):
+    # Pushed to every live socket so open lists can patch themselves in place
+    upserted, deleted = list(upserted), [str(reminder_id) for reminder_id in deleted]
+    if len(upserted) + len(deleted) <= INLINE_CHANGES:
+        frames = [{
+            "type": "reminder_changed",
+            "version": version,
+            "upserted": [reminder_to_json(doc) for doc in upserted],
+            "deleted": deleted,
+        }]
+    else:
+        ids = [str(doc["_id"]) for doc in upserted] + deleted
+        frames = [{"type": "reminder_changed", "version": version, "ids": ids[start:start + IDS_PER_FRAME]}
+                  for start in range(0, len(ids), IDS_PER_FRAME)]
+    try:
+        for frame in frames:
+            await notifier.notify(None, frame)
+    except Exception as e:
+        logger.warning("[Notifier] Failed to publish reminder changes: %s", e)
@@ -1,295 +1,248 @@
-from mistralai.client import MistralClient
-from mistralai.models.chat_completion import ChatMessage
 from datetime import datetime, timedelta
-import os
-import json
 import asyncio
+import json
+import logging
+import os
 import pytz
 from app.config.database import get_database
+from app.models.reminder import DEFAULT_CATEGORY, DEFAULT_PRIORITY, PRIORITIES
+from app.services.batcher import ExtractionBatcher
+from app.services.delivery_log import delivery_log
+from app.services.extraction_cache import extraction_cache
+from app.services.llm_client import complete_json
+from app.services.metrics import metrics, span
+from app.services.prompts import SYSTEM_PROMPT, build_batch_prompt, build_prompt
+from app.services.recurrence import recurrence_for
+from app.services.notifier import send_json
+from app.services.reminder_changes import publish_changes, reserve_versions
+from app.services import rule_extractor
+from app.services.rule_extractor import (
+    ACTION_VERBS, CATEGORY_TERMS, CLOCK_PATTERN, RELATIVE_PATTERN, parse_relative, token_pattern,
+)
+from app.services.scheduler import scheduler
 
-client = MistralClient(api_key=os.getenv("MISTRAL_API_KEY"))
 INDIA_TZ = pytz.timezone("Asia/Kolkata")
 
-def build_prompt(message: str) -> str:
-   
-    return f"""
-MEDICAL TASK EXTRACTION SYSTEM
-
-You are an AI assistant specialized in extracting medical tasks and reminders from doctor's chat messages. 
-Your role is to automatically identify actionable medical tasks and schedule appropriate reminders
-
-CORE RULES:
-1. **Automatic Task Detection**: Extract tasks from ANY medical instruction, order, or note - even without explicit "remind me" keywords
-2. **Medical Context Priority**: Focus ONLY on medical tasks, procedures, patient care instructions, and clinical activities
-3. **Chat-Specific Extraction**: Only extract tasks from the current chat message, ignore other conversations
-4. **Actionable Items Only**: Extract tasks that require future action, follow-up, or monitoring
-
-MEDICAL TASK CATEGORIES TO DETECT:
-- Laboratory orders (blood work, cultures, imaging)
-- Medication administration or changes
-- Patient monitoring (vitals, symptoms, drainage)
-- Procedure scheduling (surgery, interventions)
-- Follow-up appointments or consultations
-- Patient education or counseling
-- Equipment management (catheters, drains, devices)
-- Discharge planning activities
-- Clinical documentation requirements
-
-TIMING RULES:
-1. **"Today" Scheduling** (based on current time):
-   - 06:00-12:59 AM → Remind at 1:00 PM same day
-   - 1:00 AM-3:59 PM → Remind at 4:00 PM same day
-   - 4:00 PM-7:59 PM → Remind at 8:00 PM same day
-   - 8:00 PM+ → Remind at 1:00 PM next day
-
-2. **"Tomorrow" Scheduling**: Always 6:00 AM next calendar day
-
-3. **Relative Time Calculation**: Calculate exact future time from current time
-   - "in 2 hours" → current_time + 2 hours
-   - "after 30 minutes" → current_time + 30 minutes
-   - "in 3 days" → current_time + 3 days
-
-4. **Default Timing**: If no time specified, set reminder for 1 hour from current time
-
-5. **Urgent Tasks**: For critical tasks without time, set reminder for 15 minutes from current time
-
-MEDICAL ABBREVIATIONS DICTIONARY:
-- OT: Operation Theatre
-- Hb: Hemoglobin
-- Tc: Total Count (WBC count)
-- S.Creat: Serum Creatinine
-- DM: Diabetes Mellitus
-- HTN: Hypertension
-- Foleys: Foley's Catheter
-- BP: Blood Pressure
-- HR: Heart Rate
-- RR: Respiratory Rate
-- O2 Sat: Oxygen Saturation
-- IV: Intravenous
-- IM: Intramuscular
-- PO: Per Oral (by mouth)
-- PRN: As needed
-- QID: Four times daily
-- TID: Three times daily
-- BID: Twice daily
-- NPO: Nothing by mouth
-- DVT: Deep Vein Thrombosis
-- ICU: Intensive Care Unit
-- CCU: Coronary Care Unit
-- ECG/EKG: Electrocardiogram
-- CT: Computed Tomography
-- MRI: Magnetic Resonance Imaging
-- X-ray: Radiograph
-
-TASK EXTRACTION PATTERNS:
-- Action verbs: collect, send, check, monitor, review, schedule, remove, insert, administer, prescribe
-- Medical procedures: surgery, biopsy, endoscopy, catheterization
-- Lab orders: blood work, cultures, imaging studies
-- Patient care: positioning, feeding, medication, wound care
-- Documentation: consent, notes, reports, discharge summary
-
-OUTPUT FORMAT:
-Return a JSON array of objects with exactly these fields:
-- "task": Clear, complete description of the medical task
-- "remind_at": ISO datetime string with timezone (+05:30 for IST)
-- "priority": "high", "medium", or "low" based on clinical urgency
-- "category": Medical category (lab, medication, procedure, monitoring, etc.)
-
-EXAMPLES:
-
-Current Time: 2024-07-09T10:30:00+05:30
-Input: "Patient in bed 5 needs blood culture and urine culture collected today. Schedule for SETON removal tomorrow in OT 7"
-Output: [
-    {{
-        "task": "Collect blood culture and urine culture for patient in bed 5",
-        "remind_at": "2024-07-09T13:00:00+05:30",
-        "priority": "high",
-        "category": "lab"
-    }},
-    {{
-        "task": "Schedule SETON removal in OT 7",
-        "remind_at": "2024-07-10T13:00:00+05:30",
-        "priority": "medium",
-        "category": "procedure"
-    }}
-]
-
-Current Time: 2024-07-09T14:00:00+05:30
-Input: "Check patient's sugars after two hours. Send Hb, Tc, S.Creat today"
-Output: [
-    {{
-        "task": "Check patient's blood sugar levels",
-        "remind_at": "2024-07-09T16:00:00+05:30",
-        "priority": "medium",
-        "category": "monitoring"
-    }},
-    {{
-        "task": "Send Hb, Tc, S.Creat lab orders",
-        "remind_at": "2024-07-09T16:00:00+05:30",
-        "priority": "medium",
-        "category": "lab"
-    }}
-]
-
-Current Time: 2024-07-09T09:00:00+05:30
-Input: "Remove Foleys after clamping for 4 hours"
-Output: [
-    {{
-        "task": "Remove Foley's catheter after clamping",
-        "remind_at": "2024-07-09T10:00:00+05:30",
-        "priority": "high",
-        "category": "procedure"
-    }}
-]
-
-Current Time: 2024-07-09T21:00:00+05:30
-Input: "Monitor BP every 2 hours overnight"
-Output: [
-    {{
-        "task": "Monitor blood pressure every 2 hours overnight",
-        "remind_at": "2024-07-09T23:00:00+05:30",
-        "priority": "high",
-        "category": "monitoring"
-    }}
-]
-
-IMPORTANT NOTES:
-- Extract ALL actionable medical tasks, even without explicit reminder keywords
-- Prioritize patient safety and clinical urgency
-- Use complete, clear task descriptions
-- Include patient identifiers when mentioned (bed number, name, etc.)
-- Consider medical context and standard protocols
-- Handle multiple tasks in a single message
-- Ignore non-medical conversations or casual chat
-
-Now extract medical tasks from this message:
-"{message}"
-"""
-
-async def process_message_for_reminder(message: str, websocket):
-    keywords = ["collect", "send", "check", "monitor", "review", "schedule", "remove", "insert",
-        "administer", "prescribe", "order", "request", "obtain", "perform", "conduct",
-        
-
-        "surgery", "operation", "biopsy", "endoscopy", "catheterization", "intubation",
-        "extubation", "tracheostomy", "dialysis", "chemotherapy", "radiotherapy",
-        
-
-        "blood work", "lab", "culture", "biopsy", "x-ray", "ct", "mri", "ultrasound",
-        "ecg", "ekg", "echo", "stress test", "holter", "eeg", "emg",
-        
-
-        "medication", "dose", "infusion", "injection", "wound care", "dressing",
-        "positioning", "feeding", "nutrition", "hydration", "oxygen", "ventilator",
-        
-   
-        "today", "tomorrow", "after", "in", "before", "by", "at", "every", "hourly",
-        "daily", "weekly", "morning", "afternoon", "evening", "night", "overnight",
-        
-  
-        "ot", "icu", "ccu", "er", "or", "pacu", "hb", "tc", "creat", "bp", "hr",
-        "rr", "o2", "spo2", "foleys", "iv", "im", "po", "prn", "qid", "tid", "bid",
-        
-        "consent", "discharge", "transfer", "admit", "notes", "report", "summary",
-        "assessment", "plan", "follow-up", "consultation", "referral"]
-    if not any(k in message.lower() for k in keywords):
-        await websocket.send_json({"type": "error", "message": "Please use keywords like 'remind me'"})
-        return
-
+logger = logging.getLogger(__name__)
+extractions = metrics.counter("extractions_total", "Extraction results by source (rules, cache, llm) or failure")
+
+# Optional micro-batching of LLM calls across every connection on the worker
+BATCH_ENABLED = os.getenv("LLM_BATCH_ENABLED", "false").lower() == "true"
+batcher = ExtractionBatcher(
+    build_prompt,
+    build_batch_prompt,
+    SYSTEM_PROMPT,
+    window_seconds=float(os.getenv("LLM_BATCH_WINDOW_MS", 25)) / 1000,
+    max_size=int(os.getenv("LLM_BATCH_MAX_SIZE", 8)),
+)
+
+KEYWORDS = ["remind", "collect", "send", "check", "monitor", "review", "schedule", "remove", "insert",
+    "administer", "prescribe", "order", "request", "obtain", "perform", "conduct",
+
+    "surgery", "operation", "biopsy", "endoscopy", "catheterization", "intubation",
+    "extubation", "tracheostomy", "dialysis", "chemotherapy", "radiotherapy",
+
+    "blood work", "lab", "culture", "biopsy", "x-ray", "ct", "mri", "ultrasound",
+    "ecg", "ekg", "echo", "stress test", "holter", "eeg", "emg",
+
+    "medication", "dose", "infusion", "injection", "wound care", "dressing",
+    "positioning", "feeding", "nutrition", "hydration", "oxygen", "ventilator",
+
+    "today", "tomorrow", "tonight", "after", "before", "every", "hourly",
+    "daily", "weekly", "morning", "afternoon", "evening", "night", "overnight",
+
+    "ot", "icu", "ccu", "er", "pacu", "hb", "tc", "s.creat", "creat", "bp", "hr",
+    "rr", "o2", "spo2", "foleys", "iv", "im", "po", "prn", "qid", "tid", "bid",
+
+    "consent", "discharge", "transfer", "admit", "notes", "report", "summary",
+    "assessment", "plan", "follow-up", "consultation", "referral", "hold", "withhold"]
+
+# Whole-token match, so short abbreviations like "ot" or "er" only count as
+# words of their own rather than inside "not" or "order". The rule
+# extractor's verbs and category terms count as keywords too.
+KEYWORD_PATTERN = token_pattern(
+    KEYWORDS + ACTION_VERBS + [term for terms in CATEGORY_TERMS.values() for term in terms],
+    inflections=True,
+)
+
+def has_keyword(message: str) -> bool:
+    # A clock time ("at 8 pm") or a delay ("in 4 hours") marks an order as well
+    return bool(KEYWORD_PATTERN.search(message) or CLOCK_PATTERN.search(message)
+                or RELATIVE_PATTERN.search(message))
+
+class ExtractionError(Exception):
+    """Raised when a message yields no usable tasks; the text is sent to the client."""
+
+async def extract_reminders(message: str):
+    """Run the LLM extraction for one message and return (base_time, items).
+
+    This is the slow, concurrent part of the pipeline: it never touches the
+    WebSocket, so several messages from one connection can be extracted at
+    once while their replies are still sent in order.
+    """
+    with span("keyword_gate"):
+        matched = has_keyword(message)
+    if not matched:
+        extractions.inc(source="no_keyword")
+        raise ExtractionError("Please use keywords like 'remind me'")
 
     base_time = datetime.now(INDIA_TZ)
-    print(f"[Live Time Captured]: {base_time.isoformat()}")
+    logger.debug("[Live Time Captured]: %s", base_time)
+
+    rule_items, confidence = [], 0.0
+    if rule_extractor.MODE != "off":
+        rule_items, confidence = rule_extractor.extract(message, base_time)
+        if rule_extractor.MODE == "on" and confidence >= rule_extractor.MIN_CONFIDENCE:
+            rule_extractor.stats["fast_path"] += 1
+            extractions.inc(source="rules")
+            return base_time, rule_items
+        rule_extractor.stats["llm_fallback"] += 1
+
+    cached = await extraction_cache.get(message, base_time)
+    if cached is not None:
+        extractions.inc(source="cache")
+        return base_time, cached
 
     try:
-        response = client.chat(
-            model="mistral-large-latest",
-            messages=[ChatMessage(role="user", content=build_prompt(message))],
-            response_format={"type": "json_object"}
-        )
-        result = json.loads(response.choices[0].message.content)
+        if BATCH_ENABLED:
+            result = await batcher.extract(message, base_time)
+        else:
+            content = await complete_json(build_prompt(message, base_time), SYSTEM_PROMPT)
+            with span("json_parse"):
+                result = json.loads(content)
     except Exception as e:
-        await websocket.send_json({"type": "error", "message": f"AI extraction failed: {str(e)}"})
-        return
+        extractions.inc(source="error")
+        raise ExtractionError(f"AI extraction failed: {str(e)}")
 
-    if not isinstance(result, list):
-        await websocket.send_json({"type": "error", "message": "Invalid AI response format"})
-        return
+    if not isinstance(result, list) or not all(isinstance(item, dict) for item in result):
+        extractions.inc(source="error")
+        raise ExtractionError("Invalid AI response format")
     if not result:
-        await websocket.send_json({"type": "error", "message": "No valid tasks found"})
+        extractions.inc(source="error")
+        raise ExtractionError("No valid tasks found")
+    extractions.inc(source="llm")
+    if rule_extractor.MODE == "shadow":
+        rule_extractor.record_shadow(rule_items, confidence, result)
+    await extraction_cache.put(message, base_time, result)
+    return base_time, result
+
+async def process_message_for_reminder(message: str, websocket, extraction=None):
+    # `extraction` lets the caller start extract_reminders() early and hand
+    # over the pending task; otherwise it is run inline here.
+    if extraction is None:
+        extraction = extract_reminders(message)
+    try:
+        base_time, result = await extraction
+    except ExtractionError as e:
+        await send_json(websocket, {"type": "error", "message": str(e)})
         return
 
+    tasks = []
     for item in result:
         task = item.get("task", "untitled task")
-        duration_str = item.get("duration", "1 hour")
 
         try:
             # STEP 2: Calculate the absolute future time based on the "live" time.
-            reminder_time_local = parse_duration(duration_str, base_time)
-            print(f"[Target Time Calculated]: {task} → {reminder_time_local.isoformat()} (Local)")
+            reminder_time_local = resolve_reminder_time(item, base_time)
+            logger.debug("[Target Time Calculated]: %s → %s (Local)", task, reminder_time_local)
 
             if reminder_time_local <= base_time:
                 raise ValueError("Reminder time must be in the future")
         except Exception as e:
-            await websocket.send_json({"type": "error", "message": f"Duration parse failed: {str(e)}"})
-            continue
-
-        try:
-            db = get_database()
-            
-      
-            reminder_time_utc = reminder_time_local.astimezone(pytz.utc)
-            iso_timestamp_string = reminder_time_utc.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-            
-            db.reminders.insert_one({
-                "task": task,
-                "reminder_time": iso_timestamp_string, 
-                "completed": False
-            })
-            print(f"[DB Saved as ISO String]: {task} → {iso_timestamp_string}")
-        except Exception as e:
-            await websocket.send_json({"type": "error", "message": f"Database error: {str(e)}"})
+            await send_json(websocket, {"type": "error", "message": f"Duration parse failed: {str(e)}"})
             continue
+        priority = str(item.get("priority") or DEFAULT_PRIORITY).lower()
+        if priority not in PRIORITIES:
+            priority = DEFAULT_PRIORITY
+        category = str(item.get("category") or DEFAULT_CATEGORY).lower()
+        # Repeating orders keep one document; later occurrences are computed
+        # from the rule as each one fires.
+        recurrence = recurrence_for(item, reminder_time_local)
+        tasks.append((task, reminder_time_local, priority, category, recurrence))
+
+    if not tasks:
+        return
 
-        await websocket.send_json({
-            "type": "confirmation",
-            "message": f"Reminder set for '{task}' at {reminder_time_local.strftime('%I:%M %p')}"
-        })
+    # All tasks extracted from one message are written in a single round trip.
+    client_id = websocket.state.client_id
+    documents = []
+    for task, reminder_time_local, priority, category, recurrence in tasks:
+        document = {
+            "task": task,
+            "reminder_time": reminder_time_local.astimezone(pytz.utc),
+            "completed": False,
+            "priority": priority,
+            "category": category,
+            "client_id": client_id
+        }
+        if recurrence:
+            document["recurrence"] = recurrence
+        documents.append(document)
+    try:
+        # Shielded: once the insert is under way, the reminders get written
+        # and scheduled even if the client disconnects meanwhile.
+        await asyncio.shield(save_reminders(documents, tasks))
+    except Exception as e:
+        await send_json(websocket, {"type": "error", "message": f"Database error: {str(e)}"})
+        return
+    await publish_changes(documents[-1]["version"], upserted=documents)
 
-        # STEP 3: Schedule the notification. Pass the absolute local time.
-        asyncio.create_task(schedule_notification(task, reminder_time_local, websocket))
+    confirmations = [{
+        "type": "confirmation",
+        "message": confirmation_text(task, reminder_time_local, recurrence)
+    } for task, reminder_time_local, _, _, recurrence in tasks]
+    try:
+        confirmations = await delivery_log.record(client_id, confirmations)
+    except Exception as e:
+        logger.warning("[Delivery Log] Failed to record confirmations: %s", e)
+
+    for confirmation in confirmations:
+        await send_json(websocket, confirmation)
+
+async def save_reminders(documents: list, tasks: list):
+    """Insert the documents and queue each one with the scheduler.
+
+    Scheduling happens as soon as insert_many returns, before anything else
+    is awaited, so a saved reminder is never left out of the scheduler.
+    """
+    db = get_database()
+    with span("db_write"):
+        async with reserve_versions(db, len(documents)) as first_version:
+            for offset, document in enumerate(documents):
+                document["version"] = first_version + offset
+            inserted = await db.reminders.insert_many(documents)
+            for (task, reminder_time_local, _, _, _), document, reminder_id in zip(tasks, documents, inserted.inserted_ids):
+                # STEP 3: Schedule the notification. Pass the absolute local time.
+                schedule_notification(reminder_id, task, reminder_time_local, document["client_id"])
+    logger.debug("[DB Saved]: %d reminder(s)", len(documents))
+
+def confirmation_text(task: str, reminder_time: datetime, recurrence=None) -> str:
+    text = f"Reminder set for '{task}' at {reminder_time.strftime('%I:%M %p')}"
+    if recurrence:
+        until = recurrence["until"].astimezone(INDIA_TZ)
+        text += f", repeating until {until.strftime('%d %b %I:%M %p')}"
+    return text
+
+def resolve_reminder_time(item: dict, base_time: datetime) -> datetime:
+    # The prompt asks for an absolute "remind_at"; older replies carried a
+    # relative "duration" instead.
+    remind_at = item.get("remind_at")
+    if remind_at:
+        reminder_time = datetime.fromisoformat(remind_at.replace("Z", "+00:00"))
+        if reminder_time.tzinfo is None:
+            reminder_time = INDIA_TZ.localize(reminder_time)
+        return reminder_time.astimezone(INDIA_TZ)
+    return parse_duration(item.get("duration", "1 hour"), base_time)
 
 def parse_duration(duration_str: str, base_time: datetime) -> datetime:
-    # This function correctly calculates the future time from the base time.
-    duration_str = duration_str.lower().strip()
-    parts = duration_str.split()
-    if len(parts) < 2: return base_time + timedelta(hours=1)
-    try:
-        value = float(parts[0])
-        unit = parts[1]
-    except Exception:
+    # Accepts "2 hours", "after two hours", "in 30 mins"; defaults to one hour.
+    delta = parse_relative(duration_str or "")
+    if delta is None:
         return base_time + timedelta(hours=1)
-    if "second" in unit: return base_time + timedelta(seconds=value)
-    elif "minute" in unit: return base_time + timedelta(minutes=value)
-    elif "hour" in unit: return base_time + timedelta(hours=value)
-    elif "day" in unit: return base_time + timedelta(days=value)
-    return base_time + timedelta(hours=1)
-
-async def schedule_notification(task: str, reminder_time: datetime, websocket):
-    # This function's logic is the key to correct timing.
-    # It calculates the remaining seconds to wait from "now".
-    now = datetime.now(reminder_time.tzinfo) # Use the same timezone as the target time
-    wait_seconds = (reminder_time - now).total_seconds()
-
-    print(f"[Scheduler] Waiting {wait_seconds:.1f}s for task: {task}")
+    return base_time + delta
 
-    if wait_seconds > 0:
-        await asyncio.sleep(wait_seconds)
-
-    try:
-        if websocket.client_state.name != "CONNECTED":
-            print(f"[⛔] WebSocket closed before notification: {task}")
-            return
-        await websocket.send_json({"type": "notification", "task": task})
-        print(f"[🔔 Notification Sent] {task} at {datetime.now(INDIA_TZ).strftime('%I:%M:%S %p')} IST")
-    except Exception as e:
-        print(f"[WebSocket Error] Failed to send notification: {e}")
\ No newline at end of file
+def schedule_notification(reminder_id, task: str, reminder_time: datetime, client_id):
+    # Hand the reminder to the shared scheduler instead of sleeping in a
+    # task of its own; the scheduler marks it as fired in Mongo when due.
+    logger.debug("[Scheduler] Queued task: %s → %s", task, reminder_time)
+    scheduler.schedule(reminder_id, task, reminder_time, client_id)
@@ -0,0 +1,241 @@
+from datetime import datetime, timedelta
+import logging
+import os
+import re
+import pytz
+
+INDIA_TZ = pytz.timezone("Asia/Kolkata")
+
+logger = logging.getLogger(__name__)
+
+# "off": LLM only; "shadow": LLM answers, rules are scored against it;
+# "on": confident rule matches skip the LLM.
+MODE = os.getenv("RULE_EXTRACTOR_MODE", "shadow").lower()
+MIN_CONFIDENCE = float(os.getenv("RULE_EXTRACTOR_MIN_CONFIDENCE", 0.9))
+
+ACTION_VERBS = ["collect", "send", "check", "monitor", "review", "schedule", "remove", "insert",
+    "administer", "prescribe", "order", "request", "obtain", "perform", "conduct", "repeat",
+    "give", "start", "stop", "change"]
+
+# Abbreviations from prompts.ABBREVIATIONS, grouped by category
+CATEGORY_TERMS = {
+    "lab": ["hb", "tc", "s.creat", "creat", "blood work", "culture", "cultures", "lab", "labs",
+            "urine", "biopsy"],
+    "imaging": ["ct", "mri", "x-ray", "xray", "ultrasound", "echo", "ecg", "ekg"],
+    "monitoring": ["bp", "hr", "rr", "o2 sat", "spo2", "vitals", "temperature", "sugar", "sugars",
+                   "input output"],
+    "medication": ["iv", "im", "po", "prn", "qid", "tid", "bid", "dose", "medication",
+                   "injection", "infusion", "antibiotic", "antibiotics"],
+    "procedure": ["ot", "foleys", "foley's", "catheter", "drain", "dressing", "suture", "sutures",
+                  "surgery", "seton", "endoscopy", "dialysis"],
+}
+# Dosing frequencies from the dictionary, as hours between doses
+FREQUENCY_HOURS = {"qid": 6, "qds": 6, "tid": 8, "tds": 8, "bid": 12, "hourly": 1, "daily": 24,
+                   "twice daily": 12, "twice a day": 12, "three times daily": 8, "thrice daily": 8,
+                   "four times daily": 6}
+URGENT_TERMS = ["urgent", "urgently", "stat", "immediately", "asap", "now"]
+NEGATION_TERMS = ["not", "no", "never", "don't", "don’t", "dont", "doesn't", "shouldn't", "cannot",
+    "can't", "avoid", "avoided", "skip", "skipped", "cancel", "cancelled", "canceled", "withhold", "hold"]
+
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+                "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+                "half an": 0.5, "half": 0.5}
+UNIT_SECONDS = {"second": 1, "sec": 1, "minute": 60, "min": 60, "hour": 3600, "hr": 3600, "day": 86400}
+
+def _alternation(words):
+    # Longest first so "s.creat" wins over "creat"
+    return "|".join(re.escape(w) for w in sorted(set(words), key=len, reverse=True))
+
+def token_pattern(words, inflections: bool = False):
+    """Compile a case-insensitive matcher for whole tokens in `words`.
+
+    With `inflections`, plural and verb endings ("cultures", "checked") count too.
+    """
+    suffix = "(?:s|es|ed|ing)?" if inflections else ""
+    return re.compile(rf"(?<![\w.])(?:{_alternation(words)}){suffix}(?![\w])", re.IGNORECASE)
+
+_NUMBER = rf"(?:\d+(?:\.\d+)?|{_alternation(NUMBER_WORDS)})"
+_UNIT = r"(?:seconds?|secs?|minutes?|mins?|hours?|hrs?|days?)"
+RELATIVE_PATTERN = re.compile(rf"(?:\b(after|in|within|for)\s+)?\b({_NUMBER})\s*({_UNIT})\b", re.IGNORECASE)
+DAY_PATTERN = re.compile(r"\b(today|tomorrow)\b", re.IGNORECASE)
+VERB_PATTERN = token_pattern(ACTION_VERBS, inflections=True)
+CATEGORY_PATTERNS = {category: token_pattern(terms) for category, terms in CATEGORY_TERMS.items()}
+URGENT_PATTERN = token_pattern(URGENT_TERMS)
+NEGATION_PATTERN = token_pattern(NEGATION_TERMS)
+# "at 5 pm", "10am", "17:30", "noon"
+CLOCK_PATTERN = re.compile(
+    r"\b\d{1,2}(?::\d{2})?\s*(?:a\.?m\b\.?|p\.?m\b\.?)|\b\d{1,2}:\d{2}\b|\bat\s+\d{1,2}\b"
+    r"|\b(?:noon|midday|midnight|o'?clock)\b",
+    re.IGNORECASE,
+)
+# "every 2 hours", "every hour", "q4h"
+EVERY_PATTERN = re.compile(rf"\bevery\s+(?:({_NUMBER})\s*)?({_UNIT})\b|\bq(\d+)h\b", re.IGNORECASE)
+FREQUENCY_PATTERN = token_pattern(FREQUENCY_HOURS)
+SPAN_PATTERN = re.compile(rf"\bfor\s+(?:the\s+next\s+)?({_NUMBER})\s*({_UNIT})\b", re.IGNORECASE)
+OVERNIGHT_PATTERN = re.compile(r"\bovernight\b", re.IGNORECASE)
+# "." only ends a clause before whitespace, so "S.Creat" stays in one piece
+CLAUSE_SPLIT = re.compile(r"[.;]+(?=\s|$)\s*|\n+|\s+(?:and then|then)\s+", re.IGNORECASE)
+
+stats = {"fast_path": 0, "llm_fallback": 0, "shadow_compared": 0, "shadow_agreed": 0}
+
+
+def parse_relative(text: str):
+    """Return the timedelta of the first "N unit" phrase in `text`, or None."""
+    match = RELATIVE_PATTERN.search(text)
+    if not match:
+        return None
+    number, unit = match.group(2).lower(), match.group(3).lower()
+    value = NUMBER_WORDS[number] if number in NUMBER_WORDS else float(number)
+    for prefix, seconds in UNIT_SECONDS.items():
+        if unit.startswith(prefix):
+            return timedelta(seconds=value * seconds)
+    return None
+
+def parse_recurrence(text: str, start: datetime):
+    """Return (rrule, until) for a repeating order, or None.
+
+    `rrule` is an RRULE body such as "FREQ=HOURLY;INTERVAL=2". `until` comes
+    from "overnight" (06:00 the next morning) or "for 3 days", and is None
+    when the text gives no end.
+    """
+    every = EVERY_PATTERN.search(text)
+    frequency = FREQUENCY_PATTERN.search(text)
+    if every and every.group(3):
+        interval = timedelta(hours=int(every.group(3)))
+    elif every:
+        interval = parse_relative(f"{every.group(1) or '1'} {every.group(2)}")
+    elif frequency:
+        interval = timedelta(hours=FREQUENCY_HOURS[frequency.group(0).lower()])
+    else:
+        return None
+    seconds = int(interval.total_seconds()) if interval else 0
+    if seconds >= 86400 and seconds % 86400 == 0:
+        rule = f"FREQ=DAILY;INTERVAL={seconds // 86400}"
+    elif seconds >= 3600 and seconds % 3600 == 0:
+        rule = f"FREQ=HOURLY;INTERVAL={seconds // 3600}"
+    elif seconds >= 60 and seconds % 60 == 0:
+        rule = f"FREQ=MINUTELY;INTERVAL={seconds // 60}"
+    else:
+        return None
+
+    until = None
+    span = SPAN_PATTERN.search(text)
+    if span:
+        until = start + parse_relative(f"{span.group(1)} {span.group(2)}")
+    elif OVERNIGHT_PATTERN.search(text):
+        local = start.astimezone(INDIA_TZ)
+        day = local.date() if local.hour < 6 else local.date() + timedelta(days=1)
+        until = INDIA_TZ.localize(datetime(day.year, day.month, day.day, 6))
+    return rule, until
+
+def snap_today(base_time: datetime) -> datetime:
+    # "Today" rules from prompts.SYSTEM_PROMPT
+    local = base_time.astimezone(INDIA_TZ)
+    day = local.date()
+    if 6 <= local.hour < 13:
+        hour = 13
+    elif local.hour < 16:
+        hour = 16
+    elif local.hour < 20:
+        hour = 20
+    else:
+        day, hour = day + timedelta(days=1), 13
+    return INDIA_TZ.localize(datetime(day.year, day.month, day.day, hour))
+
+def snap_tomorrow(base_time: datetime) -> datetime:
+    day = base_time.astimezone(INDIA_TZ).date() + timedelta(days=1)
+    return INDIA_TZ.localize(datetime(day.year, day.month, day.day, 6))
+
+def _clause_item(clause: str, base_time: datetime):
+    """Extract one task from a clause; returns (item, confidence)."""
+    verb = VERB_PATTERN.search(clause)
+    categories = [c for c, pattern in CATEGORY_PATTERNS.items() if pattern.search(clause)]
+    relative = parse_relative(clause)
+    day = DAY_PATTERN.search(clause)
+    prefix = RELATIVE_PATTERN.search(clause)
+    if prefix and (prefix.group(1) or "").lower() == "for":
+        # "clamp for 4 hours" is a duration, not a delay; leave it to the LLM
+        return None, 0.0
+    if EVERY_PATTERN.search(clause) or FREQUENCY_PATTERN.search(clause):
+        # Repeating orders need a recurrence rule, which the LLM supplies
+        return None, 0.0
+    if CLOCK_PATTERN.search(clause) or NEGATION_PATTERN.search(clause):
+        # The templates know no clock times, and "do not send Hb" is no order
+        return None, 0.0
+    timings = len(RELATIVE_PATTERN.findall(clause)) + len(DAY_PATTERN.findall(clause))
+    if timings > 1 or len(VERB_PATTERN.findall(clause)) > 1:
+        # Several orders in one clause ("check BP in 2 hours and send Hb today")
+        return None, 0.0
+
+    if relative is not None:
+        remind_at = base_time + relative
+    elif day and day.group(1).lower() == "tomorrow":
+        remind_at = snap_tomorrow(base_time)
+    elif day:
+        remind_at = snap_today(base_time)
+    else:
+        return None, 0.0
+    if not verb:
+        return None, 0.0
+
+    text = RELATIVE_PATTERN.sub("", clause)
+    text = DAY_PATTERN.sub("", text)
+    text = re.sub(r"\s+", " ", text).strip(" ,")
+    confidence = 1.0 if categories else 0.8
+    if len(categories) > 1:
+        confidence = min(confidence, 0.9)
+    item = {
+        "task": text[:1].upper() + text[1:],
+        "remind_at": remind_at.isoformat(),
+        "priority": "high" if URGENT_PATTERN.search(clause) else "medium",
+        "category": categories[0] if categories else "monitoring",
+    }
+    return item, confidence
+
+def extract(message: str, base_time: datetime):
+    """Rule-based extraction for templated orders.
+
+    Returns (items, confidence). Confidence is the lowest clause score and
+    drops to 0.0 as soon as any clause does not fit a known template, so the
+    caller can hand the whole message to the LLM.
+    """
+    clauses = [c.strip() for c in CLAUSE_SPLIT.split(message) if c and c.strip()]
+    items = []
+    confidence = 1.0 if clauses else 0.0
+    for clause in clauses:
+        item, score = _clause_item(clause, base_time)
+        if item is None:
+            return [], 0.0
+        items.append(item)
+        confidence = min(confidence, score)
+    return items, confidence
+
+def agreement(rule_items: list, llm_items: list, tolerance_seconds: float = 60) -> bool:
+    """Whether rules and LLM produced the same tasks (count, time and category)."""
+    if len(rule_items) != len(llm_items):
+        return False
+    by_time = lambda item: str(item.get("remind_at"))
+    for ours, theirs in zip(sorted(rule_items, key=by_time), sorted(llm_items, key=by_time)):
+        try:
+            delta = datetime.fromisoformat(ours["remind_at"]) - datetime.fromisoformat(theirs["remind_at"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        if abs(delta.total_seconds()) > tolerance_seconds:
+            return False
+        if ours.get("category") != theirs.get("category"):
+            return False
+    return True
+
+def record_shadow(rule_items: list, confidence: float, llm_items: list):
+    # Only confident rule answers are scored; those are the ones "on" would ship
+    if confidence < MIN_CONFIDENCE:
+        return
+    stats["shadow_compared"] += 1
+    if agreement(rule_items, llm_items):
+        stats["shadow_agreed"] += 1
+    else:
+        logger.info("[Rule Extractor] Shadow disagreement: rules=%s llm=%s", rule_items, llm_items)
+
+def shadow_agreement_rate() -> float:
+    compared = stats["shadow_compared"]
+    return round(stats["shadow_agreed"] / compared, 4) if compared else 0.0
@@ -0,0 +1,273 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from app.services.metrics import metrics
+from app.services.recurrence import next_occurrence
+from app.services.reminder_changes import publish_changes, reserve_versions
+
+# Reminders already overdue by more than this when the server starts are
+# marked as missed instead of all firing at once
+MISSED_AFTER_SECONDS = float(os.getenv("SCHEDULER_MISSED_AFTER_SECONDS", 3600))
+
+logger = logging.getLogger(__name__)
+lag_seconds = metrics.histogram("scheduler_lag_seconds", "Delay between a reminder's due time and its delivery")
+fired_total = metrics.counter("scheduler_fired_total", "Reminders delivered by the scheduler")
+
+
+def to_epoch(value) -> float:
+    # reminder_time is a BSON date; documents not yet migrated hold an ISO string.
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+class ReminderScheduler:
+    """Single-timer scheduler for every pending reminder in the process.
+
+    Pending reminders live in one min-heap ordered by due time, and one
+    background task sleeps until the earliest entry is due. Memory per
+    reminder is a small tuple and there is only ever one wakeup timer,
+    however many reminders are pending. A recurring reminder has a single
+    entry too: when it fires, its next occurrence is computed from the rule
+    and pushed in its place.
+
+    Reminders due within `coalesce_window` seconds of the earliest one are
+    fired together, and each client gets one delivery for all of its tasks.
+    """
+
+    def __init__(self, coalesce_window: float = 0.0):
+        self.coalesce_window = coalesce_window
+        self._heap = []
+        self._counter = itertools.count()
+        self._queued = set()
+        self._cancelled = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._deliveries = set()
+        self.db = None
+        self.deliver = None
+        self.fired_count = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    async def start(self, db, deliver):
+        """Load pending reminders from Mongo and start the timer loop."""
+        self.db = db
+        self.deliver = deliver
+        await self.load_pending()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def load_pending(self):
+        # {"$in": [False, None]} rather than $ne so the (completed, fired,
+        # reminder_time) index can serve it
+        query = {"completed": False, "fired": {"$in": [False, None]}}
+        projection = {"task": 1, "reminder_time": 1, "client_id": 1, "recurrence": 1}
+        docs = await self.db.reminders.find(query, projection).to_list(length=None)
+        cutoff = time.time() - MISSED_AFTER_SECONDS
+        missed, stale_series, loaded, unowned = [], [], 0, 0
+        for doc in docs:
+            try:
+                due = to_epoch(doc["reminder_time"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if due < cutoff:
+                (stale_series if doc.get("recurrence") else missed).append(doc)
+            elif doc.get("client_id") is None:
+                # Reminders from before client ids have no owner to notify,
+                # and a broadcast would reach every user
+                unowned += 1
+            else:
+                self._push(due, doc["_id"], doc.get("task", "untitled task"), doc["client_id"])
+                loaded += 1
+        if missed:
+            await self.db.reminders.update_many(
+                {"_id": {"$in": [doc["_id"] for doc in missed]}, "fired": {"$ne": True}},
+                {"$set": {"fired": True, "fired_at": datetime.now(timezone.utc), "missed": True}},
+            )
+        for doc in stale_series:
+            await self._skip_missed(doc)
+        self._wakeup.set()
+        logger.info("[Scheduler] Loaded %d pending reminders; %d missed, %d without an owner",
+                    loaded, len(missed) + len(stale_series), unowned)
+
+    async def _skip_missed(self, doc):
+        # A series that fell behind resumes at its next occurrence from now
+        next_time = next_occurrence(doc["recurrence"], datetime.now(timezone.utc))
+        if next_time is None:
+            await self.db.reminders.update_one(
+                {"_id": doc["_id"], "fired": {"$ne": True}},
+                {"$set": {"fired": True, "fired_at": datetime.now(timezone.utc), "missed": True}},
+            )
+            return
+        async with reserve_versions(self.db) as version:
+            await self.db.reminders.update_one(
+                {"_id": doc["_id"], "fired": {"$ne": True}},
+                {"$set": {"reminder_time": next_time, "version": version}},
+            )
+        if doc.get("client_id") is not None:
+            self._push(next_time.timestamp(), doc["_id"], doc.get("task", "untitled task"), doc["client_id"])
+
+    def schedule(self, reminder_id, task: str, reminder_time: datetime, client_id=None):
+        """Queue a reminder for delivery to every live socket of `client_id`.
+
+        Reminders without a client id are not queued; there is nobody to
+        deliver them to.
+        """
+        if client_id is None:
+            return
+        due = reminder_time.timestamp()
+        self._cancelled.discard(reminder_id)
+        self._push(due, reminder_id, task, client_id)
+        if self._heap[0][0] == due:
+            self._wakeup.set()
+
+    def cancel(self, reminder_id):
+        """Lazily drop a reminder; the heap entry is skipped when it comes due."""
+        if reminder_id in self._queued:
+            self._cancelled.add(reminder_id)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._queued) - len(self._cancelled),
+            "next_due_in": max(self._heap[0][0] - time.time(), 0.0) if self._heap else None,
+            "fired": self.fired_count,
+            "last_lag_seconds": round(self.last_lag, 4),
+            "max_lag_seconds": round(self.max_lag, 4),
+        }
+
+    def _push(self, due, reminder_id, task, client_id):
+        heapq.heappush(self._heap, (due, next(self._counter), reminder_id, task, client_id))
+        self._queued.add(reminder_id)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            # Hold the earliest reminder for the coalescing window so the
+            # ones due just after it go out in the same delivery
+            delay = self._heap[0][0] + self.coalesce_window - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = time.time()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                self._queued.discard(entry[2])
+                if entry[2] in self._cancelled:
+                    self._cancelled.discard(entry[2])
+                    continue
+                due.append(entry)
+            if due:
+                delivery = asyncio.create_task(self._fire(due, now))
+                self._deliveries.add(delivery)
+                delivery.add_done_callback(self._deliveries.discard)
+
+    async def _fire(self, entries, now):
+        ids = [entry[2] for entry in entries]
+        try:
+            claimed = await self._claim(ids)
+        except Exception as e:
+            logger.error("[Scheduler] Failed to mark reminders as fired: %s", e)
+            return
+
+        by_client = {}
+        recurring = []
+        for due, _, reminder_id, task, client_id in entries:
+            doc = claimed.get(reminder_id)
+            if doc is None:
+                continue
+            lag = now - due
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.fired_count += 1
+            lag_seconds.observe(lag)
+            fired_total.inc()
+            by_client.setdefault(client_id, []).append(task)
+            if doc.get("recurrence"):
+                recurring.append((doc, task, client_id))
+
+        # One delivery per client, all clients at once
+        await asyncio.gather(*(self._deliver(client_id, tasks) for client_id, tasks in by_client.items()))
+        if recurring:
+            await self._advance_all(recurring)
+
+    async def _deliver(self, client_id, tasks: list):
+        try:
+            await self.deliver(tasks, client_id)
+        except Exception as e:
+            logger.warning("[Scheduler] Failed to deliver notification: %s", e)
+
+    async def _claim(self, ids) -> dict:
+        # Only reminders that are still open and not yet fired are delivered,
+        # so a reminder completed while pending never notifies. Each document
+        # is claimed atomically under a fresh token, so when several workers
+        # hold the same reminder exactly one of them delivers it.
+        token = uuid.uuid4().hex
+        await self.db.reminders.update_many(
+            {"_id": {"$in": ids}, "completed": False, "fired": {"$ne": True}},
+            {"$set": {"fired": True, "fired_at": datetime.now(timezone.utc), "fired_by": token}},
+        )
+        query = {"_id": {"$in": ids}, "fired_by": token}
+        projection = {"recurrence": 1, "fired_by": 1}
+        return {doc["_id"]: doc async for doc in self.db.reminders.find(query, projection)}
+
+    async def _advance_all(self, recurring: list):
+        # Recurring reminders fired together share one version range and go
+        # out as a single reminder_changed push.
+        advanced = []
+        try:
+            async with reserve_versions(self.db, len(recurring)) as first_version:
+                for offset, (doc, task, client_id) in enumerate(recurring):
+                    try:
+                        updated = await self._advance(doc, task, client_id, first_version + offset)
+                    except Exception as e:
+                        logger.error("[Scheduler] Failed to advance recurring reminder %s: %s", doc["_id"], e)
+                        continue
+                    if updated is not None:
+                        advanced.append(updated)
+        except Exception as e:
+            logger.error("[Scheduler] Failed to reserve versions for recurring reminders: %s", e)
+        if advanced:
+            await publish_changes(max(doc["version"] for doc in advanced), upserted=advanced)
+
+    async def _advance(self, doc, task, client_id, version: int):
+        # Occurrences missed while the server was down are skipped rather
+        # than delivered in a burst. The fired_by guard keeps a second worker
+        # from advancing the same occurrence.
+        next_time = next_occurrence(doc["recurrence"], datetime.now(timezone.utc))
+        if next_time is None:
+            return None
+        updated = await self.db.reminders.find_one_and_update(
+            {"_id": doc["_id"], "fired_by": doc["fired_by"], "completed": False},
+            {"$set": {"reminder_time": next_time, "fired": False, "version": version}, "$unset": {"fired_by": ""}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated is not None:
+            self.schedule(doc["_id"], task, next_time, client_id)
+        return updated
+
+scheduler = ReminderScheduler(coalesce_window=float(os.getenv("NOTIFY_COALESCE_WINDOW_MS", 250)) / 1000)
@@ -0,0 +1,81 @@
+"""Check the extraction prompt against the fixture corpus.
+
+Reports the prompt size for every case in fixtures/extraction_cases.json.
+With --live, it also sends each case to Mistral (MISTRAL_API_KEY) and
+scores the reply against the expected items. A case passes when it has the
+same number of tasks, each remind_at within tolerance (1 minute by default)
+and each category matching. A recurring item must also come back with a
+recurrence rule.
+
+    cd backend && python -m benchmarks.prompt_eval [--live]
+"""
+from datetime import datetime
+import argparse
+import asyncio
+import json
+import os
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "extraction_cases.json")
+
+
+async def run_case(case: dict, live: bool) -> dict:
+    from app.services.llm_client import complete_json
+    from app.services.prompts import SYSTEM_PROMPT, build_prompt, estimate_tokens
+    from app.services.rule_extractor import agreement
+
+    base_time = datetime.fromisoformat(case["time"])
+    prompt = build_prompt(case["message"], base_time)
+    result = {
+        "message": case["message"],
+        "prompt_tokens": estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt),
+    }
+    if not live:
+        return result
+
+    try:
+        items = json.loads(await complete_json(prompt, SYSTEM_PROMPT))
+    except Exception as e:
+        return {**result, "passed": False, "error": repr(e)}
+    if not isinstance(items, list):
+        return {**result, "passed": False, "error": "reply is not a JSON array", "items": items}
+    tolerance = case.get("tolerance_minutes", 1) * 60
+    passed = agreement(case["expected"], items, tolerance_seconds=tolerance)
+    if passed and any(e.get("recurring") for e in case["expected"]):
+        passed = all(bool(i.get("recurrence")) == bool(e.get("recurring"))
+                     for e, i in zip(sorted(case["expected"], key=lambda x: x["remind_at"]),
+                                     sorted(items, key=lambda x: str(x.get("remind_at")))))
+    return {**result, "passed": passed, "items": items}
+
+async def evaluate(cases: list, live: bool) -> list:
+    # Sequential so the numbers are not skewed by rate limiting
+    return [await run_case(case, live) for case in cases]
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the extraction prompt on the fixture corpus")
+    parser.add_argument("--live", action="store_true", help="call Mistral and score the replies")
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--output", help="write per-case results as JSON")
+    args = parser.parse_args()
+    if not args.live:
+        os.environ.setdefault("MISTRAL_API_KEY", "offline")
+
+    with open(args.fixtures) as f:
+        cases = json.load(f)
+    results = asyncio.run(evaluate(cases, args.live))
+
+    for result in results:
+        status = "" if "passed" not in result else ("PASS " if result["passed"] else "FAIL ")
+        print(f"{status}{result['prompt_tokens']:>5} tokens  {result['message']}")
+        if result.get("passed") is False:
+            print(f"      got: {result.get('items', result.get('error'))}")
+    tokens = [result["prompt_tokens"] for result in results]
+    print(f"prompt tokens (estimated): mean {sum(tokens) / len(tokens):.0f}, max {max(tokens)}")
+    if args.live:
+        passed = sum(1 for result in results if result["passed"])
+        print(f"passed {passed}/{len(results)}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
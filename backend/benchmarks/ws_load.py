@@ -0,0 +1,262 @@
+"""Offline load test for the /ws extraction and notification path.
+
+Runs the FastAPI app from main.py under uvicorn in a background thread.
+Mistral is replaced by a stub with configurable latency and failure rate,
+and MongoDB by mongomock-motor. N concurrent WebSocket clients then drive
+the server. The report covers:
+  * message -> confirmation latency (p50/p95/p99),
+  * message throughput,
+  * notification firing jitter for a preloaded set of pending reminders.
+Results are written as JSON, and --compare prints deltas against an
+earlier run.
+
+    cd backend && pip install -r benchmarks/requirements.txt
+    python -m benchmarks.ws_load --clients 50 --messages 20 --pending 10000
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+
+MESSAGES = [
+    "Check patient's sugars after two hours",
+    "Send Hb, Tc, S.Creat today",
+    "Remove Foleys after clamping for 4 hours",
+    "Monitor BP every 2 hours overnight",
+    "Schedule SETON removal tomorrow in OT 7",
+    "Collect blood culture and urine culture for bed 5 today",
+]
+
+
+class StubMistralClient:
+    """Stands in for MistralAsyncClient.chat with fake latency and failures."""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, failure_rate: float):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.failures = 0
+
+    async def chat(self, model, messages, response_format=None):
+        from mistralai.exceptions import MistralAPIException
+        self.calls += 1
+        await asyncio.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        if random.random() < self.failure_rate:
+            self.failures += 1
+            raise MistralAPIException("stubbed upstream error", http_status=503)
+        remind_at = datetime.now(timezone(timedelta(hours=5, minutes=30))) + timedelta(hours=1)
+        content = json.dumps([{
+            "task": f"Benchmark task {self.calls}",
+            "remind_at": remind_at.isoformat(),
+            "priority": "medium",
+            "category": "monitoring",
+        }])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+    }
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+async def preload_pending(db, count: int, window_seconds: float, client_ids: list):
+    # Due times are encoded in the task so clients can measure firing jitter
+    start = time.time() + 2
+    batch = []
+    for i in range(count):
+        due = start + window_seconds * i / max(count, 1)
+        batch.append({
+            "task": f"pending {due:.6f}",
+            "reminder_time": datetime.fromtimestamp(due, timezone.utc),
+            "completed": False,
+            "priority": "medium",
+            "category": "monitoring",
+            "client_id": client_ids[i % len(client_ids)],
+        })
+        if len(batch) == 5000:
+            await db.reminders.insert_many(batch)
+            batch = []
+    if batch:
+        await db.reminders.insert_many(batch)
+
+async def run_client(url: str, client_id: str, messages: int, results: dict, done: asyncio.Event):
+    import websockets
+    sent = collections.deque()
+    async with websockets.connect(f"{url}?client_id={client_id}", max_queue=None) as ws:
+        async def receive():
+            async for raw in ws:
+                data = json.loads(raw)
+                for message in data["messages"] if data.get("type") == "replay" else [data]:
+                    kind = message.get("type")
+                    now = time.perf_counter()
+                    if kind in ("confirmation", "error") and sent and sent[0][1] is None:
+                        sent[0][1] = now
+                        results["latency"].append(now - sent[0][0])
+                        results["errors"] += kind == "error"
+                    elif kind == "message" and not message.get("isBot") and sent:
+                        sent.popleft()
+                        results["completed"] += 1
+                    elif kind == "notification":
+                        # Reminders due together arrive as one digest
+                        for task in message.get("tasks") or [message.get("task", "")]:
+                            if task.startswith("pending "):
+                                results["jitter"].append(time.time() - float(task.split()[1]))
+                        results["notification_frames"] += 1
+
+        receiver = asyncio.create_task(receive())
+        for _ in range(messages):
+            sent.append([time.perf_counter(), None])
+            await ws.send(random.choice(MESSAGES))
+        while sent:
+            await asyncio.sleep(0.01)
+        await done.wait()
+        receiver.cancel()
+
+async def drive(args, url: str, client_ids: list, stub) -> dict:
+    results = {"latency": [], "jitter": [], "errors": 0, "completed": 0, "notification_frames": 0}
+    done = asyncio.Event()
+    started = time.perf_counter()
+    clients = [asyncio.create_task(run_client(url, cid, args.messages, results, done)) for cid in client_ids]
+
+    # Message phase: every client has had all its messages answered
+    while results["completed"] < args.clients * args.messages:
+        if any(c.done() and c.exception() for c in clients):
+            raise next(c.exception() for c in clients if c.done() and c.exception())
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    # Notification phase: wait until the preloaded reminders have come due
+    deadline = time.time() + args.notify_window + 5
+    while len(results["jitter"]) < args.pending and time.time() < deadline:
+        await asyncio.sleep(0.1)
+    done.set()
+    await asyncio.gather(*clients, return_exceptions=True)
+
+    total = args.clients * args.messages
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args) | {"output": None, "compare": None},
+        "messages": total,
+        "errors": results["errors"],
+        "elapsed_seconds": elapsed,
+        "throughput_msgs_per_second": total / elapsed if elapsed else 0.0,
+        "confirmation_latency_seconds": percentiles(results["latency"]),
+        "notifications": {
+            "pending": args.pending,
+            "received": len(results["jitter"]),
+            "frames": results["notification_frames"],
+            "jitter_seconds": percentiles(results["jitter"]),
+        },
+        "llm": {"calls": stub.calls, "failures": stub.failures},
+    }
+
+def start_server(port: int):
+    import uvicorn
+    import main
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+def print_report(report: dict, baseline: dict = None):
+    def line(label, path, unit=""):
+        value = report
+        base = baseline
+        for key in path:
+            value = value.get(key, {}) if isinstance(value, dict) else {}
+            base = base.get(key, {}) if isinstance(base, dict) else {}
+        if not isinstance(value, (int, float)):
+            return
+        delta = ""
+        if isinstance(base, (int, float)) and base:
+            delta = f"  ({(value - base) / base:+.1%} vs {baseline['commit']})"
+        print(f"{label:<34}{value:>12.4f}{unit}{delta}")
+
+    print(f"commit {report['commit']}  clients={report['config']['clients']} "
+          f"messages={report['messages']} pending={report['config']['pending']}")
+    line("throughput (msg/s)", ["throughput_msgs_per_second"])
+    for q in ("p50", "p95", "p99"):
+        line(f"confirmation latency {q} (s)", ["confirmation_latency_seconds", q])
+    for q in ("p50", "p95", "p99", "max"):
+        line(f"notification jitter {q} (s)", ["notifications", "jitter_seconds", q])
+    print(f"notifications received            {report['notifications']['received']}/{report['notifications']['pending']}"
+          f" in {report['notifications'].get('frames', '?')} frames")
+    print(f"errors                            {report['errors']}  (LLM failures injected: {report['llm']['failures']})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /ws extraction and notification path")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=10, help="messages per client")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--pending", type=int, default=10000, help="preloaded pending reminders")
+    parser.add_argument("--notify-window", type=float, default=20, help="seconds over which they come due")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    from mongomock_motor import AsyncMongoMockClient
+    import app.config.database as database
+    import app.services.llm_client as llm_client
+
+    database._client = AsyncMongoMockClient()
+    stub = StubMistralClient(args.llm_latency_ms, args.llm_jitter_ms, args.llm_failure_rate)
+    llm_client.client = stub
+
+    client_ids = [f"bench-{i}" for i in range(args.clients)]
+    asyncio.run(preload_pending(database.get_database(), args.pending, args.notify_window, client_ids))
+
+    port = free_port()
+    server, thread = start_server(port)
+    try:
+        report = asyncio.run(drive(args, f"ws://127.0.0.1:{port}/ws", client_ids, stub))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
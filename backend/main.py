@@ -1,7 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.config.database import get_database
-from app.routes import reminders,websocket
+from app.config.database import get_database, close_database, ensure_indexes
+from app.config.logging import setup_logging, stop_logging
+from app.routes import reminders,websocket,extraction,metrics,scheduler as scheduler_routes
+from app.services.notifier import notifier
+from app.services.profiler import profiler
+from app.services.scheduler import scheduler
 from dotenv import load_dotenv
 import os
 
@@ -17,16 +21,35 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Version", "ETag"],
 )
 
 # Include routes
 app.include_router(websocket.router)
 app.include_router(reminders.router)
+app.include_router(scheduler_routes.router)
+app.include_router(extraction.router)
+app.include_router(metrics.router)
 
 # Initialize database
 @app.on_event("startup")
 async def startup_event():
+    setup_logging()
+    if profiler:
+        profiler.start()
     app.db = get_database()
+    await ensure_indexes(app.db)
+    await notifier.start()
+    await scheduler.start(app.db, deliver=websocket.send_notification)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await scheduler.stop()
+    await notifier.stop()
+    close_database()
+    if profiler:
+        profiler.stop()
+    stop_logging()
 
 if __name__ == "__main__":
     import uvicorn
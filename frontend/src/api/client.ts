@@ -1,18 +1,67 @@
-import type { Reminder } from '../types/app';
+import type { Reminder, ReminderChanges } from '../types/app';
 
-export const getReminders = async (): Promise<Reminder[]> => {
-  const response = await fetch('https://ai-powered-remainder-setting.onrender.com/reminders');
-  console.log('Fetching reminders from API', response);
+const API_URL = 'https://ai-powered-remainder-setting.onrender.com';
+
+export interface ReminderFilters {
+  completed?: boolean;
+  start?: string; // ISO string
+  end?: string; // ISO string
+  priority?: string;
+  category?: string;
+}
+
+// Fetch one keyset page; the server returns the next cursor in X-Next-Cursor.
+export const getRemindersPage = async (
+  filters: ReminderFilters = {},
+  cursor?: string,
+  limit = 100
+): Promise<{ reminders: Reminder[]; nextCursor: string | null; version: number }> => {
+  const params = new URLSearchParams({ limit: String(limit) });
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value !== undefined) params.set(key, String(value));
+  });
+  if (cursor) params.set('cursor', cursor);
+  // Unchanged pages are revalidated with If-None-Match and served from the
+  // browser cache on a 304
+  const response = await fetch(`${API_URL}/reminders?${params.toString()}`, { cache: 'no-cache' });
   if (!response.ok) {
     throw new Error('Failed to fetch reminders');
   }
   const reminders = await response.json();
-  console.log('Reminders received:', JSON.stringify(reminders, null, 2)); // Detailed debug log
-  return reminders;
+  return {
+    reminders,
+    nextCursor: response.headers.get('X-Next-Cursor'),
+    version: Number(response.headers.get('X-Version') || 0),
+  };
+};
+
+export const getReminders = async (
+  filters: ReminderFilters = {}
+): Promise<{ reminders: Reminder[]; version: number }> => {
+  const reminders: Reminder[] = [];
+  let cursor: string | undefined;
+  let version = 0;
+  do {
+    const page = await getRemindersPage(filters, cursor);
+    reminders.push(...page.reminders);
+    // The first page's version is the safe one to resume deltas from
+    if (!cursor) version = page.version;
+    cursor = page.nextCursor ?? undefined;
+  } while (cursor);
+  return { reminders, version };
+};
+
+// Reminders created or toggled, and ids deleted, after `since`
+export const getReminderChanges = async (since: number): Promise<ReminderChanges> => {
+  const response = await fetch(`${API_URL}/reminders?since=${since}`, { cache: 'no-cache' });
+  if (!response.ok) {
+    throw new Error('Failed to fetch reminder changes');
+  }
+  return response.json();
 };
 
 export const toggleReminderCompletion = async (id: string): Promise<Reminder> => {
-  const response = await fetch(`https://ai-powered-remainder-setting.onrender.com/reminders/${id}`, {
+  const response = await fetch(`${API_URL}/reminders/${id}`, {
     method: 'PATCH',
     headers: {
       'Content-Type': 'application/json',
@@ -24,54 +73,37 @@ export const toggleReminderCompletion = async (id: string): Promise<Reminder> =>
   return response.json();
 };
 
-export const deleteAllReminders = async (): Promise<void> => {
-  try {
-    // Fetch all reminders to get their IDs
-    const reminders = await getReminders();
-    if (reminders.length === 0) {
-      console.log('No reminders to delete.');
-      return;
-    }
-
-    // Validate and filter reminders with valid ID (try 'id', '_id', 'reminderId')
-    const validReminders = reminders.filter((reminder) => {
-      const reminderId = reminder.id || reminder._id || reminder.reminderId;
-      if (!reminderId || typeof reminderId !== 'string') {
-        console.warn('Skipping reminder with invalid ID:', JSON.stringify(reminder, null, 2));
-        return false;
-      }
-      return true;
-    });
+export interface BulkResult {
+  action: 'complete' | 'uncomplete' | 'delete';
+  matched: number;
+  modified: number;
+  results: Record<string, string>;
+}
 
-    if (validReminders.length === 0) {
-      console.log('No valid reminders to delete.');
-      return;
-    }
-
-    // Send DELETE request for each valid reminder
-    const deletePromises = validReminders.map((reminder) => {
-      const reminderId = reminder.id || reminder._id || reminder.reminderId;
-      return fetch(`https://ai-powered-remainder-setting.onrender.com/api/reminders/${reminderId}`, {
-        method: 'DELETE',
-        headers: {
-          'Content-Type': 'application/json',
-          // Uncomment and add token if authentication is required
-          // 'Authorization': `Bearer ${localStorage.getItem('token') || 'your-token-here'}`,
-        },
-      }).then((response) => {
-        if (!response.ok) {
-          throw new Error(`Failed to delete reminder ${reminderId}: ${response.statusText}`);
-        }
-        console.log(`Successfully deleted reminder ${reminderId}`);
-      });
-    });
+// One request for any number of reminders, by id list or by filter
+export const bulkUpdateReminders = async (
+  action: BulkResult['action'],
+  target: { ids: string[] } | { filter: ReminderFilters }
+): Promise<BulkResult> => {
+  const response = await fetch(`${API_URL}/reminders/bulk`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ action, ...target }),
+  });
+  if (!response.ok) {
+    throw new Error(`Failed to ${action} reminders`);
+  }
+  return response.json();
+};
 
-    await Promise.all(deletePromises);
-    console.log('All valid reminders deleted successfully.');
+export const deleteAllReminders = async (): Promise<void> => {
+  try {
+    const { modified } = await bulkUpdateReminders('delete', { filter: {} });
+    console.log(`Deleted ${modified} reminders.`);
   } catch (error) {
     console.error('Error deleting all reminders:', error);
     throw new Error('Failed to delete all reminders');
   }
-
- 
-};
\ No newline at end of file
+};
@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import { format } from 'date-fns';
 import type { Reminder } from '../types/app';
-import { Calendar, Clock, CheckCircle, Circle } from 'lucide-react';
+import { Calendar, Clock, CheckCircle, Circle, Repeat } from 'lucide-react';
 import { toggleReminderCompletion } from '../api/client';
 
 interface ReminderCardProps {
@@ -60,6 +60,14 @@ const ReminderCard: React.FC<ReminderCardProps> = ({ reminder }) => {
             <Clock size={14} />
             <span>{formattedDateTime}</span>
           </div>
+          {reminder.recurrence && (
+            <div className="flex items-center space-x-2 text-sm text-wa-text-light mt-1">
+              <Repeat size={14} />
+              <span>
+                Repeats until {format(new Date(reminder.recurrence.until), "MMM d, h:mm a")}
+              </span>
+            </div>
+          )}
         </div>
       </div>
     </div>
@@ -1,11 +1,36 @@
 import { useEffect, useRef, useCallback, useState } from 'react';
 
 const WS_URL = 'wss://ai-powered-remainder-setting.onrender.com/ws';
+// How long a gap in delivery sequences may stay open before it is asked for
+const GAP_WAIT_MS = 2000;
+
+// Stable per-browser id so the server can route notifications to every
+// socket this client opens, on whichever worker holds it.
+const getClientId = (): string => {
+  let clientId = localStorage.getItem('clientId');
+  if (!clientId) {
+    clientId = crypto.randomUUID();
+    localStorage.setItem('clientId', clientId);
+  }
+  return clientId;
+};
 
 export const useWebSocket = (onMessage: (data: any) => void) => {
   const socketRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<ReturnType<typeof setTimeout> | null>(null);
   const reconnectAttemptsRef = useRef(0);
+  // Delivery sequences this socket has handled: everything up to
+  // seenSeqRef, plus later ones that arrived ahead of a gap. Frames do not
+  // arrive in sequence order (confirmations are sent directly, notifications
+  // through pub/sub), so a gap that stays open is asked for with a replay.
+  // Each socket keeps its own: App and the reminders page both connect with
+  // the same client id and receive the same messages.
+  const seenSeqRef = useRef<number | null>(null);
+  const aheadRef = useRef(new Set<number>());
+  const gapTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null);
+  // Once the next replay arrives, everything up to here counts as handled;
+  // whatever it did not contain is gone from the server's log
+  const settleRef = useRef<number | null>(null);
   const maxReconnectAttempts = 5;
   const baseReconnectDelay = 3000; // 3 seconds
 
@@ -21,7 +46,21 @@ export const useWebSocket = (onMessage: (data: any) => void) => {
       return;
     }
 
-    const socket = new WebSocket(WS_URL);
+    // Send the last delivery sequence we saw so the server replays what was
+    // missed while disconnected
+    if (seenSeqRef.current === null) {
+      seenSeqRef.current = Number(localStorage.getItem('lastSeq') || 0);
+    }
+    // Always sent, 0 included: anything logged while this client had never
+    // connected is replayed too
+    const params = new URLSearchParams({
+      client_id: getClientId(),
+      cursor: String(seenSeqRef.current),
+    });
+    if (aheadRef.current.size > 0) {
+      settleRef.current = Math.max(...aheadRef.current);
+    }
+    const socket = new WebSocket(`${WS_URL}?${params.toString()}`);
     socketRef.current = socket;
     setConnectionStatus('CONNECTING');
 
@@ -31,11 +70,60 @@ export const useWebSocket = (onMessage: (data: any) => void) => {
       reconnectAttemptsRef.current = 0; // Reset attempts on success
     };
 
+    // Move seenSeqRef up over every sequence handled without a gap
+    const advance = () => {
+      let seen = seenSeqRef.current ?? 0;
+      while (aheadRef.current.has(seen + 1)) {
+        seen += 1;
+        aheadRef.current.delete(seen);
+      }
+      seenSeqRef.current = seen;
+      // Remembered for the next page load; never moved backwards
+      if (seen > Number(localStorage.getItem('lastSeq') || 0)) {
+        localStorage.setItem('lastSeq', String(seen));
+      }
+    };
+
+    const watchGap = () => {
+      if (aheadRef.current.size === 0) {
+        if (gapTimerRef.current) clearTimeout(gapTimerRef.current);
+        gapTimerRef.current = null;
+        return;
+      }
+      if (gapTimerRef.current) return;
+      gapTimerRef.current = setTimeout(() => {
+        gapTimerRef.current = null;
+        if (aheadRef.current.size === 0 || socket.readyState !== WebSocket.OPEN) return;
+        settleRef.current = Math.max(...aheadRef.current);
+        socket.send(JSON.stringify({ type: 'replay', cursor: seenSeqRef.current ?? 0 }));
+      }, GAP_WAIT_MS);
+    };
+
     socket.onmessage = (event) => {
       try {
         const parsedData = JSON.parse(event.data);
         console.log('WebSocket message received:', parsedData);
-        onMessage(parsedData);
+        const messages = parsedData.type === 'replay' ? parsedData.messages : [parsedData];
+        messages.forEach((message: any) => {
+          const seq = typeof message.seq === 'number' ? message.seq : null;
+          // Skip anything this socket already handled (a message can arrive
+          // live and in a replay)
+          if (seq !== null && (seq <= (seenSeqRef.current ?? 0) || aheadRef.current.has(seq))) return;
+          onMessage(message);
+          if (seq !== null) {
+            aheadRef.current.add(seq);
+            advance();
+          }
+        });
+        if (parsedData.type === 'replay' && settleRef.current !== null) {
+          seenSeqRef.current = Math.max(seenSeqRef.current ?? 0, settleRef.current);
+          aheadRef.current.forEach((seq) => {
+            if (seq <= (seenSeqRef.current ?? 0)) aheadRef.current.delete(seq);
+          });
+          settleRef.current = null;
+          advance();
+        }
+        watchGap();
       } catch (error) {
         console.error('Failed to parse WebSocket message:', event.data, error);
       }
@@ -67,6 +155,10 @@ export const useWebSocket = (onMessage: (data: any) => void) => {
       if (reconnectTimeoutRef.current) {
         clearTimeout(reconnectTimeoutRef.current); // Clear any pending reconnects
       }
+      if (gapTimerRef.current) {
+        clearTimeout(gapTimerRef.current);
+        gapTimerRef.current = null;
+      }
       if (socketRef.current) {
         socketRef.current.onclose = null; // Prevent reconnect on intentional close
         socketRef.current.close();
@@ -1,7 +1,7 @@
-import { useState, useEffect, useCallback } from 'react';
-import { getReminders, deleteAllReminders } from '../api/client';
+import { useState, useEffect, useCallback, useRef } from 'react';
+import { getReminders, getReminderChanges, deleteAllReminders } from '../api/client';
 import { useWebSocket } from '../hooks/useWebSocket';
-import type { Reminder } from '../types/app';
+import type { Reminder, ReminderChangedEvent, ReminderChanges } from '../types/app';
 import ReminderCard from '../components/Remindercard';
 import { Link } from 'react-router-dom';
 import { ChevronLeft, Calendar, Trash2 } from 'lucide-react';
@@ -11,16 +11,40 @@ const RemindersListPage = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [showLongTerm, setShowLongTerm] = useState(false);
+  const versionRef = useRef(0);
+
+  // Sort reminders by reminder_time (newest first)
+  const sortReminders = (list: Reminder[]) =>
+    list.sort((a, b) => new Date(b.reminder_time).getTime() - new Date(a.reminder_time).getTime());
+
+  // Version each id was deleted at, so a late push cannot bring it back
+  const deletedRef = useRef(new Map<string, number>());
+
+  // Patch the list in place from a delta instead of reloading it. Pushes can
+  // arrive out of order, so each reminder is only replaced by a newer
+  // version of itself.
+  const applyChanges = useCallback((changes: ReminderChanges) => {
+    changes.deleted.forEach((id) => deletedRef.current.set(id, changes.version));
+    setReminders((prev) => {
+      const byId = new Map(prev.map((r) => [r._id, r]));
+      changes.deleted.forEach((id) => byId.delete(id));
+      changes.upserted.forEach((reminder) => {
+        const version = reminder.version ?? 0;
+        const current = byId.get(reminder._id);
+        if (current && (current.version ?? 0) > version) return;
+        if ((deletedRef.current.get(reminder._id) ?? -1) >= version) return;
+        byId.set(reminder._id, reminder);
+      });
+      return sortReminders([...byId.values()]);
+    });
+  }, []);
 
   const fetchReminders = async () => {
     try {
       setError(null);
-      const remindersData = await getReminders();
-      // Sort reminders by reminder_time (newest first)
-      remindersData.sort((a, b) => 
-        new Date(b.reminder_time).getTime() - new Date(a.reminder_time).getTime()
-      );
-      setReminders(remindersData);
+      const { reminders: remindersData, version } = await getReminders();
+      versionRef.current = version;
+      setReminders(sortReminders(remindersData));
     } catch (error) {
       console.error('Error fetching reminders:', error);
       setError('Failed to load reminders. Please try again.');
@@ -29,21 +53,45 @@ const RemindersListPage = () => {
     }
   };
 
-  // Handle WebSocket messages to refresh reminders
+  // Fetch everything changed after the version the list is at
+  const catchUp = useCallback(() => {
+    if (versionRef.current === 0) return;
+    getReminderChanges(versionRef.current).then((changes) => {
+      applyChanges(changes);
+      // Only fetched deltas move the watermark; the server never reports a
+      // version past a write that is still in flight
+      versionRef.current = Math.max(versionRef.current, changes.version);
+    }).catch((error) => {
+      console.error('Error fetching reminder changes:', error);
+    });
+  }, [applyChanges]);
+
+  // The server pushes every create, toggle and delete; bulk changes only
+  // carry ids, so the documents are fetched
   const handleWebSocketMessage = useCallback((data: any) => {
-    console.log('WebSocket update received:', data);
-    // Assuming the WebSocket sends a message indicating a change in reminders
-    if (data.type === 'reminderUpdate') {
-      fetchReminders(); // Refresh reminders on update
+    if (data.type === 'reminder_changed') {
+      const event = data as ReminderChangedEvent;
+      if (event.ids) {
+        catchUp();
+      } else {
+        applyChanges(event as ReminderChanges);
+      }
     }
-  }, []);
+  }, [applyChanges, catchUp]);
 
-  const { sendMessage, connectionStatus } = useWebSocket(handleWebSocketMessage);
+  const { connectionStatus } = useWebSocket(handleWebSocketMessage);
 
   useEffect(() => {
     fetchReminders();
   }, []);
 
+  // Catch up on changes pushed while the socket was down
+  useEffect(() => {
+    if (connectionStatus === 'OPEN') {
+      catchUp();
+    }
+  }, [connectionStatus, catchUp]);
+
   // Clear all reminders by calling the API and updating state
   const handleClearReminders = async () => {
     if (!window.confirm('Are you sure you want to delete all reminders?')) return;
@@ -51,11 +99,7 @@ const RemindersListPage = () => {
       setLoading(true);
       setError(null);
       await deleteAllReminders(); // Call API to delete all reminders
-      setReminders([]); // Clear reminders in state
-      // Notify backend via WebSocket
-      if (connectionStatus === 'OPEN') {
-        sendMessage(JSON.stringify({ type: 'reminderUpdate' }));
-      }
+      setReminders([]); // Clear reminders in state; other clients get a reminder_changed push
     } catch (error) {
       console.error('Error deleting reminders:', error);
       setError('Failed to delete reminders. Please try again.');
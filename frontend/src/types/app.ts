@@ -12,9 +12,33 @@ export interface Reminder {
   task: string;
   reminder_time: string; // ISO string
   completed: boolean; // Add this field
+  priority?: 'high' | 'medium' | 'low';
+  category?: string;
+  version?: number;
+  recurrence?: ReminderRecurrence; // Repeating orders only
+  upcoming?: string[]; // Next occurrences, expanded by the server
   [key: string]: any; // For additional fields that might be present
 }
 
+export interface ReminderRecurrence {
+  rule: string; // RRULE, e.g. "FREQ=HOURLY;INTERVAL=2"
+  start: string;
+  until: string;
+}
+
+// Payload of GET /reminders?since=N and of "reminder_changed" events
+export interface ReminderChanges {
+  version: number;
+  upserted: Reminder[];
+  deleted: string[];
+}
+
+// Bulk changes are pushed as ids only; the documents come from ?since=N
+export interface ReminderChangedEvent extends Partial<ReminderChanges> {
+  version: number;
+  ids?: string[];
+}
+
 export interface NotificationToast {
   id: number;
   task: string;